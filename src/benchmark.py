@@ -0,0 +1,228 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from classes.heuristics import make_heuristic
+from classes.location_grid import LocationGrid
+from classes.node import a_star
+from classes.shapefile_points import read_points, write_points
+
+# The benchmarks never draw, nothing needs a display even if matplotlib gets imported
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+# The map the synthetic point clouds are spread on, it's the one of crime_dt
+SYNTHETIC_BBOX = (-73.59, 45.49, -73.55, 45.53)
+
+# The columns of the CSV output, every measure is a row
+RESULT_FIELDS = ["dataset", "points", "grid_size", "threshold", "stage", "seconds", "peak_memory_bytes", "queries",
+                 "found", "mean_query_seconds", "p50_query_seconds", "p95_query_seconds", "nodes_expanded"]
+
+
+# Runs the benchmarks and writes their results, see --help for the options
+def main():
+    arguments = parse_arguments()
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as directory:
+        datasets = [(os.path.basename(shapefile), shapefile) for shapefile in arguments.shapefile]
+
+        for count in arguments.synthetic:
+            shapefile = os.path.join(directory, "synthetic_%d" % count)
+            write_points(shapefile, synthetic_points(count, arguments.seed))
+            datasets.append(("synthetic_%d" % count, shapefile))
+
+        for name, shapefile in datasets:
+            results.extend(benchmark_dataset(name, shapefile, arguments))
+
+    report = {"arguments": vars(arguments), "environment": environment(), "results": results}
+
+    if arguments.json:
+        with open(arguments.json, "w") as json_file:
+            json.dump(report, json_file, indent=1)
+
+    if arguments.csv:
+        with open(arguments.csv, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+
+    if not arguments.json and not arguments.csv:
+        print(json.dumps(report, indent=1))
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Times the loading of the points, the building of the grids and "
+                                                 "the path searches, with their peak memory.")
+    parser.add_argument("--shapefile", nargs="*", default=["./../resources/crime_dt"],
+                        help="the point shapefiles to benchmark (default: %(default)s)")
+    parser.add_argument("--synthetic", nargs="*", type=int, default=[],
+                        help="the sizes of the synthetic point clouds to benchmark, eg: 10000 1000000")
+    parser.add_argument("--grid-sizes", nargs="+", type=float, default=[0.002, 0.001])
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.5, 0.9])
+    parser.add_argument("--queries", type=int, default=100, help="the number of random routes searched per grid")
+    parser.add_argument("--heuristic", default="octile")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the synthetic points and of the routes")
+    parser.add_argument("--json", help="the file the results are written to as JSON")
+    parser.add_argument("--csv", help="the file the results are written to as CSV")
+    return parser.parse_args()
+
+
+# A point cloud like the crimes of a city: most points are gathered around a few hot spots, the rest are spread
+# over the whole map
+def synthetic_points(count: int, seed: int) -> np.ndarray:
+    generator = np.random.default_rng(seed)
+    x1, y1, x2, y2 = SYNTHETIC_BBOX
+    spread_count = count // 4
+
+    centers = generator.uniform((x1, y1), (x2, y2), size=(20, 2))
+    gathered = centers[generator.integers(len(centers), size=count - spread_count)]
+    gathered += generator.normal(scale=(x2 - x1) / 30, size=gathered.shape)
+
+    points = np.concatenate([generator.uniform((x1, y1), (x2, y2), size=(spread_count, 2)), gathered])
+    return np.clip(points, (x1, y1), (x2, y2))
+
+
+# Runs every stage on the dataset, for every grid size and threshold
+def benchmark_dataset(name: str, shapefile: str, arguments: argparse.Namespace) -> list:
+    results = []
+
+    def record(stage: str, measure: tuple, **values) -> None:
+        seconds, peak_memory, _ = measure
+        results.append(dict({field: None for field in RESULT_FIELDS}, dataset=name, points=point_count,
+                            stage=stage, seconds=seconds, peak_memory_bytes=peak_memory, **values))
+
+    load = measured(read_points, shapefile)
+    point_count = len(load[2][0])
+    record("load", load)
+
+    construct = measured(LocationGrid, shapefile, arguments.grid_sizes[0], arguments.thresholds[0])
+    graph = construct[2]
+    record("construct", construct, grid_size=arguments.grid_sizes[0], threshold=arguments.thresholds[0])
+
+    # The stages changing the map are run again from the same state, which these put it back to
+    def change_grid_size() -> None:
+        graph.grid_size = grid_size * 2
+
+    def change_grid() -> None:
+        change_grid_size()
+        graph.grid_size = grid_size
+
+    def change_threshold() -> None:
+        graph.threshold = last_threshold
+        graph.set_coordinates_validity()
+        graph.threshold = threshold
+
+    def drop_neighbours() -> None:
+        graph.move_table.rebuild(graph.blocked_matrix, graph.invalid_matrix)
+
+    for grid_size in arguments.grid_sizes:
+        # Setting the grid size it already has does nothing, so the grid is first changed to another size
+        if graph.grid_size == grid_size:
+            change_grid_size()
+
+        record("binning", measured(setattr, graph, "grid_size", grid_size, reset=change_grid_size),
+               grid_size=grid_size)
+
+        last_threshold = None
+
+        for index, threshold in enumerate(arguments.thresholds):
+            graph.threshold = threshold
+
+            # The first threshold of a grid builds everything, the others only update what changed
+            stage, reset = ("validity", change_grid) if index == 0 else ("threshold_update", change_threshold)
+            record(stage, measured(graph.set_coordinates_validity, reset=reset), grid_size=grid_size,
+                   threshold=threshold)
+            last_threshold = threshold
+
+            # The neighbour lists of the search are built on the first search
+            record("neighbours", measured(lambda: graph.move_table.neighbours(0), reset=drop_neighbours),
+                   grid_size=grid_size, threshold=threshold)
+
+            measure = measured(search_routes, graph, arguments.queries, arguments.heuristic, arguments.seed)
+            record("queries", measure, grid_size=grid_size, threshold=threshold, **measure[2])
+
+    return results
+
+
+# Searches random routes between the valid points of the map that have at least one move, and returns what they did
+def search_routes(graph: LocationGrid, queries: int, heuristic: str, seed: int) -> dict:
+    move_table = graph.move_table
+    valid_ids = np.flatnonzero((move_table.masks.ravel() != 0) & ~graph.invalid_matrix.ravel()).tolist()
+    generator = random.Random(seed)
+    times = []
+    found = 0
+    nodes_expanded = 0
+
+    for _ in range(queries if len(valid_ids) > 1 else 0):
+        start_id, end_id = generator.sample(valid_ids, 2)
+
+        search_time = time.perf_counter()
+        path, _, expanded = a_star(move_table, start_id, end_id, make_heuristic(heuristic, move_table, end_id))
+        times.append(time.perf_counter() - search_time)
+
+        found += bool(path)
+        nodes_expanded += expanded
+
+    if not times:
+        return {"queries": 0, "found": 0, "nodes_expanded": 0}
+
+    times.sort()
+    return {"queries": len(times), "found": found, "mean_query_seconds": statistics.mean(times),
+            "p50_query_seconds": times[len(times) // 2], "p95_query_seconds": times[int(len(times) * 0.95)],
+            "nodes_expanded": nodes_expanded}
+
+
+# Calls the function and returns how long it took, the most memory it allocated at once and what it returned.
+# Tracing the allocations slows down the Python code a lot, so the memory is measured in a first call and the time
+# in a second one, which gives the value. When the function changes what the next call does, reset is called in
+# between to put everything back like before the first call.
+def measured(function, *args, reset=None) -> tuple:
+    tracemalloc.start()
+
+    try:
+        function(*args)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if reset is not None:
+        reset()
+
+    start_time = time.perf_counter()
+    value = function(*args)
+    seconds = time.perf_counter() - start_time
+
+    return seconds, peak_memory, value
+
+
+# What the results depend on besides the code. matplotlib isn't used, its version is read without importing it.
+def environment() -> dict:
+    import pandas
+    from importlib import metadata
+
+    try:
+        matplotlib_version = metadata.version("matplotlib")
+    except metadata.PackageNotFoundError:
+        matplotlib_version = None
+
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pandas.__version__,
+            "matplotlib": matplotlib_version, "platform": platform.platform(), "processor": platform.processor(),
+            "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+if __name__ == "__main__":
+    main()
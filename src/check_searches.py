@@ -0,0 +1,148 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import argparse
+import math
+import sys
+
+import numpy as np
+
+from classes.heuristics import make_heuristic
+from classes.jump_point_search import jump_point_search
+from classes.location_grid import LocationGrid
+from classes.move_table import BLOCK_EDGE_COST, DIAGONAL_COST, DIRECTIONS, STRAIGHT_COST
+from classes.node import a_star
+
+
+# Checks that the move table has the moves and costs the rules of the map give every point, worked out one point at a
+# time like the search used to, and that the jump point search finds paths as short as the ones of A* on random routes
+# of the maps, made of valid moves adding up to their cost. Exits with 1 when a point or a route doesn't match.
+def main():
+    arguments = parse_arguments()
+    generator = np.random.default_rng(arguments.seed)
+    mismatches = 0
+
+    for grid_size in arguments.grid_sizes:
+        for threshold in arguments.thresholds:
+            graph = LocationGrid(arguments.shapefile, grid_size, threshold)
+            graph.set_coordinates_validity()
+
+            for name, errors in (("points", check_move_table(graph)),
+                                 ("routes", check_jump_point_search(graph, generator, arguments.queries))):
+                mismatches += len(errors)
+                print("grid size %g, threshold %g, %s: %d mismatches" % (grid_size, threshold, name, len(errors)))
+
+                for error in errors:
+                    print("  " + error)
+
+    sys.exit(1 if mismatches else 0)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Checks the moves of the move table against the rules of the map, "
+                                                 "and the paths of the jump point search against the ones of A*.")
+    parser.add_argument("--shapefile", default="./../resources/crime_dt",
+                        help="the point shapefile of the map (default: %(default)s)")
+    parser.add_argument("--grid-sizes", nargs="+", type=float, default=[0.002, 0.001])
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.5, 0.7, 0.9])
+    parser.add_argument("--queries", type=int, default=200, help="the number of random routes searched per grid")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the routes")
+    return parser.parse_args()
+
+
+# Compares the moves of every point of the move table with the ones of reference_moves(), and returns what didn't
+# match for every point that failed
+def check_move_table(graph: LocationGrid) -> list:
+    move_table = graph.move_table
+    errors = []
+
+    for j in range(move_table.height):
+        for i in range(move_table.width):
+            point_id = move_table.point_id((i, j))
+            moves = {move_table.point(next_id): cost for next_id, cost in move_table.neighbours(point_id)}
+            expected = reference_moves(graph, (i, j))
+
+            if moves != expected:
+                errors.append("%s: moves %s, expected %s" % ((i, j), moves, expected))
+
+    return errors
+
+
+# The valid moves from the lattice point (i, j) with their cost, from the rules of the map:
+#   - the target point is a valid point of the map
+#   - from the boundary edges, only the moves going inside the map are possible
+#   - a diagonal move can't cross a yellow block, and costs 1.5
+#   - a vertical or horizontal move can't go in between two yellow blocks, and costs 1.3 along one of them, 1 otherwise
+# The edge points in between two yellow blocks and the corners in a yellow block are invalid, so these aren't checked
+# from them.
+def reference_moves(graph: LocationGrid, point: tuple) -> dict:
+    i, j = point
+    height, width = graph.invalid_matrix.shape
+    on_x_edge, on_y_edge = i in (0, width - 1), j in (0, height - 1)
+    moves = {}
+
+    for di, dj in DIRECTIONS:
+        target = (i + di, j + dj)
+
+        if not (0 <= target[0] < width and 0 <= target[1] < height) or graph.is_invalid_point(target):
+            continue
+
+        if (i == 0 and di != 1) or (i == width - 1 and di != -1) or (j == 0 and dj != 1) \
+                or (j == height - 1 and dj != -1):
+            continue
+
+        blocked_count = graph.count_blocked_blocks(point, target)
+
+        if di != 0 and dj != 0:
+            if blocked_count and not (on_x_edge and on_y_edge):
+                continue
+
+            moves[target] = DIAGONAL_COST
+        else:
+            if blocked_count == 2 and not (on_x_edge or on_y_edge):
+                continue
+
+            moves[target] = BLOCK_EDGE_COST if blocked_count else STRAIGHT_COST
+
+    return moves
+
+
+# Searches random routes between the points of the map that have a move with both searches, and returns what didn't
+# match for every route that failed
+def check_jump_point_search(graph: LocationGrid, generator: np.random.Generator, queries: int) -> list:
+    move_table = graph.move_table
+    valid_ids = np.flatnonzero((move_table.masks.ravel() != 0) & ~graph.invalid_matrix.ravel())
+    errors = []
+
+    if len(valid_ids) < 2:
+        return errors
+
+    for start_id, end_id in generator.choice(valid_ids, size=(queries, 2)).tolist():
+        heuristic = make_heuristic("octile", move_table, end_id)
+        path, cost, _ = a_star(move_table, start_id, end_id, heuristic)
+        jump_path, jump_cost, _ = jump_point_search(move_table, start_id, end_id, heuristic)
+        route = "%s to %s" % (move_table.point(start_id), move_table.point(end_id))
+
+        if (cost is None) != (jump_cost is None) or cost is not None and not math.isclose(cost, jump_cost):
+            errors.append("%s: A* cost %s, jump point search cost %s" % (route, cost, jump_cost))
+        elif jump_path and (jump_path[0] != start_id or jump_path[-1] != end_id
+                            or not math.isclose(path_cost(move_table, jump_path), jump_cost)):
+            errors.append("%s: the jump point search path doesn't add up to its cost %s" % (route, jump_cost))
+
+    return errors
+
+
+# The cost of the path as the sum of its moves, inf when two of its points aren't a valid move apart
+def path_cost(move_table, path: list) -> float:
+    cost = 0
+
+    for source_id, target_id in zip(path, path[1:]):
+        cost += dict(move_table.neighbours(source_id)).get(target_id, math.inf)
+
+    return cost
+
+
+if __name__ == "__main__":
+    main()
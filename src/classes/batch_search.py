@@ -0,0 +1,122 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import csv
+import multiprocessing as mp
+from collections import namedtuple
+
+import numpy as np
+
+from classes.location_grid import LocationGrid
+from classes.move_table import MoveTable
+from classes.heuristics import make_heuristic
+from classes.node import a_star
+from classes.shared_arrays import attach_move_table, share_move_table
+
+# This is what a batch search gives back for every pair of points, in the order the searches complete.
+# index is the position of the pair in the batch, start and end are the coordinates actually used.
+# cost is None when no path was found, and path only has the coordinates of the path when they were asked for.
+# timed_out tells apart the searches stopped by the time limit, whose cost is None too, from the pairs without a path.
+RouteResult = namedtuple("RouteResult", ["index", "start", "end", "cost", "path_length", "nodes_expanded", "path",
+                                         "timed_out"])
+
+# The move table each worker process searches in, attached to the shared memory once when the worker starts
+_worker_move_table: MoveTable
+_worker_memory: list
+
+
+# Reads the start and end points of the routes from a CSV file with a start_x, start_y, end_x, end_y row per route.
+# A header row is skipped.
+def read_route_pairs(csv_path: str):
+    with open(csv_path, newline="") as csv_file:
+        for row in csv.reader(csv_file):
+            try:
+                start_x, start_y, end_x, end_y = (float(value) for value in row[:4])
+            except ValueError:
+                continue
+
+            yield (start_x, start_y), (end_x, end_y)
+
+
+# Searches the shortest path of every (start, end) pair on the map, which is either an iterable of pairs of
+# coordinates or the path of a CSV file of routes. The set_coordinates_validity() of the map must have been called.
+# The searches are spread over a pool of processes that all read the same move table from shared memory, and the
+# results are yielded as soon as they come back. heuristic and weight are the ones of informed_search(), a heuristic
+# function has to be defined at the top level of a module to be sent to the processes. mode is the one of
+# LocationGrid.snap() for the coordinates of the pairs.
+def batch_search(graph: LocationGrid, pairs, processes: int = None, chunk_size: int = 16,
+                 time_limit: float = None, return_paths: bool = False, heuristic="octile", weight: float = 1.0,
+                 mode: str = "auto"):
+    if isinstance(pairs, str):
+        pairs = read_route_pairs(pairs)
+
+    move_table = graph.move_table
+    tasks = []
+
+    # Every pair is snapped to the map here, all at once, so the workers only get point ids
+    routes = np.array([(start_coords, end_coords) for start_coords, end_coords in pairs],
+                      dtype=np.float64).reshape(-1, 2, 2)
+    start_points = graph.snap(routes[:, 0], mode)
+    end_points = graph.snap(routes[:, 1], mode)
+
+    start_ids = (start_points[:, 1] * move_table.width + start_points[:, 0]).tolist()
+    end_ids = (end_points[:, 1] * move_table.width + end_points[:, 0]).tolist()
+    invalid = (graph.invalid_matrix[start_points[:, 1], start_points[:, 0]]
+               | graph.invalid_matrix[end_points[:, 1], end_points[:, 0]]).tolist()
+
+    start_coords = zip(graph.x_lattice[start_points[:, 0]].tolist(), graph.y_lattice[start_points[:, 1]].tolist())
+    end_coords = zip(graph.x_lattice[end_points[:, 0]].tolist(), graph.y_lattice[end_points[:, 1]].tolist())
+
+    for index, start, end in zip(range(len(routes)), start_coords, end_coords):
+        # There's no need to search when one of the points is invalid
+        if invalid[index]:
+            yield RouteResult(index, start, end, None, 0, 0, [] if return_paths else None, False)
+            continue
+
+        tasks.append((index, start, end, start_ids[index], end_ids[index], time_limit, return_paths, heuristic, weight))
+
+    if not tasks:
+        return
+
+    # The move table is copied once into shared memory, the workers then map it without any other copy
+    memory, description = share_move_table(move_table)
+
+    try:
+        with mp.Pool(processes, initializer=_attach_move_table, initargs=(description,)) as pool:
+            for index, start_coords, end_coords, cost, path_length, nodes_expanded, path, timed_out in \
+                    pool.imap_unordered(_search_pair, tasks, chunksize=chunk_size):
+                if path is not None:
+                    path = [graph.to_coordinates(move_table.point(point_id)) for point_id in path]
+
+                yield RouteResult(index, start_coords, end_coords, cost, path_length, nodes_expanded, path, timed_out)
+    finally:
+        for block in memory:
+            block.close()
+            block.unlink()
+
+
+# Runs in every worker process when it starts, the move table is built on the shared memory of the batch
+def _attach_move_table(description: tuple) -> None:
+    global _worker_move_table, _worker_memory
+
+    # The memory blocks are kept so they stay mapped as long as the worker lives
+    _worker_move_table, _worker_memory = attach_move_table(description)
+
+
+# Runs in the worker processes, searches one pair of points
+def _search_pair(task: tuple) -> tuple:
+    index, start_coords, end_coords, start_id, end_id, time_limit, return_paths, heuristic, weight = task
+    heuristic = make_heuristic(heuristic, _worker_move_table, end_id, weight)
+
+    timed_out = False
+
+    try:
+        path, cost, nodes_expanded = a_star(_worker_move_table, start_id, end_id, heuristic, time_limit)
+    except TimeoutError:
+        path, cost, nodes_expanded = [], None, 0
+        timed_out = True
+
+    # Unless they're asked for, only the length of the path goes back to the main process
+    return index, start_coords, end_coords, cost, len(path), nodes_expanded, path if return_paths else None, timed_out
@@ -0,0 +1,138 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import heapq
+import math
+import time
+
+import numpy as np
+
+from classes.location_grid import LocationGrid
+from classes.move_table import MoveTable
+from classes.node import build_path, check_coordinates_validity
+from classes.search_stats import SearchStats
+
+
+# This holds the cost of the shortest path from every point of the map to a target point, and the next point on
+# that path. The moves are the same both ways with the same costs, so a single Dijkstra's search from the target is
+# enough, and the route from any point is then found by following the next points, in the time of its length.
+# When stats are given, they're filled in with what the search from the target did.
+class DistanceField:
+    def __init__(self, move_table: MoveTable, target_id: int, stats: SearchStats = None):
+        self.__move_table = move_table
+        self.__target_id = target_id
+
+        distances, next_ids = shortest_paths(move_table, target_id, stats)
+
+        # Both matrices are by (j, i) like the move table, distances is inf and next_ids -1 where the target can't be
+        # reached from
+        self.__distances = distances.reshape(move_table.height, move_table.width)
+        self.__next_ids = next_ids.reshape(move_table.height, move_table.width)
+
+    # The cost of the shortest path from the point with the given id to the target, inf if there's none
+    def cost(self, point_id: int) -> float:
+        return float(self.__distances.flat[point_id])
+
+    # The ids of the points of the shortest path from the point with the given id to the target, empty if there's none
+    def route(self, point_id: int) -> list:
+        if math.isinf(self.__distances.flat[point_id]):
+            return []
+
+        next_ids = self.__next_ids.ravel()
+        path = [point_id]
+
+        while point_id != self.__target_id:
+            point_id = int(next_ids[point_id])
+            path.append(point_id)
+
+        return path
+
+    @property
+    def target_id(self) -> int:
+        return self.__target_id
+
+    @property
+    def move_table(self) -> MoveTable:
+        return self.__move_table
+
+    @property
+    def distances(self) -> np.ndarray:
+        return self.__distances
+
+    @property
+    def next_ids(self) -> np.ndarray:
+        return self.__next_ids
+
+
+# Dijkstra's search from the point over the whole map. Returns the cost of the shortest path to every point id, inf
+# for the points that can't be reached, and the point each one is reached from, -1 for the source and those points.
+# When stats are given, they're filled in like for a_star(), without a path.
+def shortest_paths(move_table: MoveTable, source_id: int, stats: SearchStats = None) -> tuple:
+    neighbours, push, pop = move_table.neighbours, heapq.heappush, heapq.heappop
+
+    if stats is not None:
+        neighbours, push, pop = stats.timed_neighbours(neighbours), stats.push, stats.pop
+
+    distances = [math.inf] * (move_table.width * move_table.height)
+    previous = [-1] * (move_table.width * move_table.height)
+    distances[source_id] = 0
+    open_list = []
+    push(open_list, (0, source_id))
+    expanded = 0
+    start_time = time.perf_counter()
+
+    while open_list:
+        distance, current_id = pop(open_list)
+
+        # The points are pushed again when a cheaper way to them is found, the older entries are skipped
+        if distance > distances[current_id]:
+            continue
+
+        expanded += 1
+
+        if stats is not None:
+            stats.expanded(current_id)
+
+        for next_id, move_cost in neighbours(current_id):
+            next_distance = distance + move_cost
+
+            if next_distance < distances[next_id]:
+                if stats is not None and distances[next_id] < math.inf:
+                    stats.duplicate_pushes += 1
+
+                distances[next_id] = next_distance
+                previous[next_id] = current_id
+                push(open_list, (next_distance, next_id))
+
+    if stats is not None:
+        stats.finished([], None, expanded, start_time)
+
+    return np.array(distances), np.array(previous, dtype=np.int64)
+
+
+# Works out the distance field to the target coordinates, which are adjusted to the map like in informed_search().
+# The set_coordinates_validity() of the map must have been called. Returns None if the target is an invalid point.
+def build_distance_field(graph: LocationGrid, target_coords: tuple, stats: SearchStats = None):
+    target_point = graph.to_lattice(check_coordinates_validity(target_coords, graph))
+
+    if graph.is_invalid_point(target_point):
+        return None
+
+    return DistanceField(graph.move_table, graph.move_table.point_id(target_point), stats)
+
+
+# The shortest path from the start coordinates to the target of the field, as the list of nodes the map draws.
+# The list is empty when there's no path. When stats are given, they get the path, with no point expanded since the
+# path is only followed.
+def field_route(graph: LocationGrid, field: DistanceField, start_coords: tuple, stats: SearchStats = None) -> list:
+    start_time = time.perf_counter()
+    start_point = graph.to_lattice(check_coordinates_validity(start_coords, graph))
+    start_id = graph.move_table.point_id(start_point)
+    path = field.route(start_id)
+
+    if stats is not None:
+        stats.finished(path, field.cost(start_id) if path else None, 0, start_time)
+
+    return build_path(graph, path)
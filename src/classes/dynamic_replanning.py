@@ -0,0 +1,261 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import heapq
+import math
+import time
+
+import numpy as np
+
+from classes.heuristics import make_heuristic
+from classes.location_grid import LocationGrid
+from classes.move_table import points_around_blocks
+from classes.node import build_path, check_coordinates_validity
+from classes.search_stats import SearchStats
+
+
+# This is a route that is kept up to date while the blocks of the map change color, with D* Lite.
+# The search goes backward from the end point, and its state is kept between the changes: the cost from every point
+# it reached to the end point (g) and the one its neighbours give (rhs). When blocks change color, only the points
+# around them are looked at again, and the search only goes on from the ones whose cost changed, so replanning costs
+# in proportion to what the change does to the route, not to the size of the map. The start point can also move
+# along the route, without starting over.
+# The moves are the ones of the move table of the map, and the heuristic is a name of the registry or a heuristic
+# factory, see make_heuristic(). It's made for the start point, so it must not overestimate any cost.
+# When stats are given, every search and update of the route adds to them like a_star() does.
+class DynamicRoute:
+    def __init__(self, graph: LocationGrid, start_coords: tuple, end_coords: tuple, heuristic="octile",
+                 stats: SearchStats = None):
+        self.__graph = graph
+        self.__heuristic_name = heuristic
+        self.__stats = stats
+        self.__push_entry, self.__pop_entry = (heapq.heappush, heapq.heappop) if stats is None \
+            else (stats.push, stats.pop)
+        self.__start_point = graph.to_lattice(check_coordinates_validity(start_coords, graph))
+        self.__end_point = graph.to_lattice(check_coordinates_validity(end_coords, graph))
+        self.__expanded = 0
+        self.__restart()
+
+    # The nodes of the current shortest path from the start point to the end point, empty when there's none
+    def path(self) -> list:
+        return build_path(self.__graph, self.__path_ids())
+
+    # Updates the route after set_coordinates_validity() or add_points() changed the color of the given blocks, as an
+    # array of (row, column) like the changed_cells of the map, which they are by default. Returns the new path.
+    # The changed_cells of the map are only the ones of its last update, so when the move table was updated more than
+    # once since the last time the route was, the route is searched again from scratch instead. It's the same when
+    # the move table of the map was built again from scratch, eg: for a new grid size.
+    def replan(self, changed_cells: np.ndarray = None) -> list:
+        missed_updates = self.__move_table.version - self.__version
+
+        if changed_cells is None:
+            changed_cells = self.__graph.changed_cells
+
+        self.__expanded = 0
+
+        if self.__graph.move_table is not self.__move_table or missed_updates > 1 \
+                or (missed_updates == 1 and changed_cells is None):
+            self.__restart()
+        elif missed_updates == 1:
+            self.__version = self.__move_table.version
+            affected_ids = self.__affected_ids(np.asarray(changed_cells).reshape(-1, 2))
+
+            # When the change is bigger than what the search reached, it's faster to start over
+            if len(affected_ids) > len(self.__rhs):
+                self.__restart()
+                return self.path()
+
+            for point_id in affected_ids:
+                self.__update_point(point_id)
+
+            self.__compute_shortest_path()
+
+        return self.path()
+
+    # Moves the start point, eg: to the next point of the path as it is followed, and returns the new path.
+    # The keys of the open list were worked out for the old start point, so they're all lowered by at most the
+    # heuristic between the two start points instead of being worked out again.
+    def move_start(self, start_coords: tuple) -> list:
+        graph = self.__graph
+        last_id = self.__start_id
+        self.__start_point = graph.to_lattice(check_coordinates_validity(start_coords, graph))
+        self.__start_id = self.__move_table.point_id(self.__start_point)
+        self.__heuristic = self.__timed(make_heuristic(self.__heuristic_name, self.__move_table, self.__start_id))
+        self.__key_offset += self.__heuristic(last_id)
+
+        self.__expanded = 0
+        self.__compute_shortest_path()
+
+        return self.path()
+
+    # Searches the route from scratch, on the current move table of the map
+    def __restart(self) -> None:
+        self.__move_table = move_table = self.__graph.move_table
+        self.__version = move_table.version  # The version of the move table the route is up to date with
+        self.__neighbours = move_table.neighbours if self.__stats is None \
+            else self.__stats.timed_neighbours(move_table.neighbours)
+        self.__start_id = move_table.point_id(self.__start_point)
+        self.__end_id = move_table.point_id(self.__end_point)
+        self.__heuristic = self.__timed(make_heuristic(self.__heuristic_name, move_table, self.__start_id))
+
+        self.__g = {}
+        self.__rhs = {self.__end_id: 0}
+        self.__key_offset = 0  # This is the km of D* Lite, it goes up every time the start point moves
+
+        # The open list is a binary heap of (key, point id), the current key of the points in it is kept apart so
+        # that the older entries of a point are skipped
+        self.__open_list = []
+        self.__open_keys = {}
+        self.__push(self.__end_id)
+
+        self.__expanded = 0
+        self.__compute_shortest_path()
+
+    # The heuristic, timed when there are stats to fill in
+    def __timed(self, heuristic):
+        return heuristic if self.__stats is None else self.__stats.timed_heuristic(heuristic)
+
+    def __key(self, point_id: int) -> tuple:
+        cost = min(self.__g.get(point_id, math.inf), self.__rhs.get(point_id, math.inf))
+        return cost + self.__heuristic(point_id) + self.__key_offset, cost
+
+    def __push(self, point_id: int) -> None:
+        key = self.__key(point_id)
+        self.__open_keys[point_id] = key
+        self.__push_entry(self.__open_list, (key, point_id))
+
+    # Works out the rhs of the point again from its neighbours, and puts it in the open list if it's inconsistent
+    def __update_point(self, point_id: int) -> None:
+        if point_id != self.__end_id:
+            g = self.__g
+            point_rhs = math.inf
+
+            for next_id, move_cost in self.__neighbours(point_id):
+                cost = move_cost + g.get(next_id, math.inf)
+
+                if cost < point_rhs:
+                    point_rhs = cost
+
+            # The points the search never reached are left out, their rhs is inf
+            if point_rhs < math.inf or point_id in self.__rhs:
+                self.__rhs[point_id] = point_rhs
+
+        self.__queue(point_id)
+
+    # Puts the point in the open list with its current key if it's inconsistent, or takes it out otherwise
+    def __queue(self, point_id: int) -> None:
+        self.__open_keys.pop(point_id, None)
+
+        if self.__g.get(point_id, math.inf) != self.__rhs.get(point_id, math.inf):
+            self.__push(point_id)
+
+    # Expands the inconsistent points until the cost of the start point is known
+    def __compute_shortest_path(self) -> None:
+        g, rhs, open_list, open_keys = self.__g, self.__rhs, self.__open_list, self.__open_keys
+        start_id, end_id = self.__start_id, self.__end_id
+        stats, pop, neighbours = self.__stats, self.__pop_entry, self.__neighbours
+        expanded = self.__expanded
+        start_time = time.perf_counter()
+
+        while open_list:
+            key, point_id = open_list[0]
+
+            # The older entries of the points are skipped
+            if open_keys.get(point_id) != key:
+                pop(open_list)
+                continue
+
+            if key >= self.__key(start_id) and rhs.get(start_id, math.inf) == g.get(start_id, math.inf):
+                break
+
+            pop(open_list)
+            del open_keys[point_id]
+            self.__expanded += 1
+
+            if stats is not None:
+                stats.expanded(point_id)
+            new_key = self.__key(point_id)
+
+            # The key was worked out for an older start point
+            if key < new_key:
+                self.__push(point_id)
+                continue
+
+            # The moves are the same both ways with the same costs, so the neighbours of the point are also the
+            # points moving to it. Only the rhs the change of its cost can change are worked out again.
+            old_g = g.get(point_id, math.inf)
+            point_rhs = rhs.get(point_id, math.inf)
+
+            if old_g > point_rhs:
+                g[point_id] = point_rhs
+
+                for next_id, move_cost in neighbours(point_id):
+                    if next_id != end_id and move_cost + point_rhs < rhs.get(next_id, math.inf):
+                        rhs[next_id] = move_cost + point_rhs
+                        self.__queue(next_id)
+            else:
+                g[point_id] = math.inf
+                self.__update_point(point_id)
+
+                for next_id, move_cost in neighbours(point_id):
+                    if rhs.get(next_id, math.inf) == move_cost + old_g:
+                        self.__update_point(next_id)
+
+        if stats is not None:
+            path = self.__path_ids()
+            stats.finished(path, g.get(start_id) if path else None, self.__expanded - expanded, start_time)
+
+    # The ids of the points whose moves may have changed with the color of the blocks: their 4 corners, and the points
+    # next to them since the moves also depend on the validity of the neighbours
+    def __affected_ids(self, cells: np.ndarray) -> list:
+        return points_around_blocks(cells, self.__move_table.width, self.__move_table.height, reach=1).tolist()
+
+    # Follows the cheapest moves from the start point to the end point. When the costs to the end point are out of
+    # date, eg: the blocks given to replan() weren't all the ones that changed, the costs don't go down along the
+    # moves, and the route is searched again from scratch instead of following them.
+    def __path_ids(self) -> list:
+        path = self.__follow_costs()
+
+        if path is None:
+            self.__restart()
+            path = self.__follow_costs()
+
+        return path
+
+    # The path following the cheapest moves, or None when a move doesn't lower the cost to the end point, which
+    # would never happen if the costs were up to date
+    def __follow_costs(self):
+        graph = self.__graph
+        g = self.__g
+
+        if graph.is_invalid_point(self.__start_point) or graph.is_invalid_point(self.__end_point) \
+                or math.isinf(g.get(self.__start_id, math.inf)):
+            return []
+
+        path = [self.__start_id]
+        cost = g[self.__start_id]
+
+        while path[-1] != self.__end_id:
+            moves = self.__move_table.neighbours(path[-1])
+            next_id, move_cost = min(moves, key=lambda move: move[1] + g.get(move[0], math.inf))
+            next_cost = g.get(next_id, math.inf)
+
+            if not next_cost < cost or not math.isclose(move_cost + next_cost, cost):
+                return None
+
+            path.append(next_id)
+            cost = next_cost
+
+        return path
+
+    # The cost of the current path, None when there's none
+    @property
+    def cost(self):
+        return self.__g.get(self.__start_id) if self.__path_ids() else None
+
+    # The number of points expanded the last time the route was searched or updated
+    @property
+    def expanded(self) -> int:
+        return self.__expanded
@@ -0,0 +1,124 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+# This keeps the arrays derived from a shapefile on disk, so they don't have to be computed again on every start.
+# Every entry is a folder of .npy files named after a hash of the shapefile content and the parameters used, so
+# an entry can't be used anymore once the shapefile changes. When the cache gets bigger than max_bytes, the least
+# recently used entries are deleted.
+class GridCache:
+    # The file remembering the hash of every shapefile, so unchanged files aren't read again to be hashed
+    SOURCES_FILE = "sources.json"
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    # Returns the hash of the content of the shapefile, it only reads the file again if its size or time changed
+    def dataset_key(self, shapefile: str) -> str:
+        path = os.path.abspath(shapefile if shapefile.lower().endswith(".shp") else shapefile + ".shp")
+        stat = os.stat(path)
+        sources_path = os.path.join(self.__directory, self.SOURCES_FILE)
+
+        try:
+            with open(sources_path) as sources_file:
+                sources = json.load(sources_file)
+        except (OSError, ValueError):
+            sources = {}
+
+        source = sources.get(path)
+
+        if source is None or source["size"] != stat.st_size or source["mtime"] != stat.st_mtime_ns:
+            digest = hashlib.sha1()
+
+            with open(path, "rb") as shp_file:
+                for chunk in iter(lambda: shp_file.read(1024 * 1024), b""):
+                    digest.update(chunk)
+
+            source = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "digest": digest.hexdigest()}
+            sources[path] = source
+
+            self.__write_atomically(sources_path, json.dumps(sources, indent=1).encode())
+
+        return source["digest"]
+
+    # Returns the arrays of the entry as read only memory maps, or None if the entry isn't in the cache
+    def load(self, key: tuple):
+        entry = self.__entry_path(key)
+
+        try:
+            arrays = {name[:-4]: np.load(os.path.join(entry, name), mmap_mode="r")
+                      for name in os.listdir(entry) if name.endswith(".npy")}
+        except (OSError, ValueError):
+            return None
+
+        # The time of the entry is when it was last used, this is what the eviction goes by
+        os.utime(entry)
+
+        return arrays
+
+    # Saves the arrays of the dictionary as a new entry, then makes room in the cache if needed
+    def store(self, key: tuple, arrays: dict) -> None:
+        entry = self.__entry_path(key)
+
+        # The entry is written in a temporary folder that is renamed when complete, so a half written entry is
+        # never loaded
+        temporary = tempfile.mkdtemp(dir=self.__directory, prefix=".tmp-")
+
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, name + ".npy"), np.ascontiguousarray(array))
+
+        try:
+            os.rename(temporary, entry)
+        except OSError:
+            # Another process stored the same entry in the meantime
+            shutil.rmtree(temporary, ignore_errors=True)
+
+        self.__evict()
+
+    # Deletes the least recently used entries until the cache fits in its maximum size
+    def __evict(self) -> None:
+        entries = []
+
+        for name in os.listdir(self.__directory):
+            entry = os.path.join(self.__directory, name)
+
+            if os.path.isdir(entry) and not name.startswith("."):
+                size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, entry in sorted(entries):
+            if total_size <= self.__max_bytes:
+                break
+
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    # The folder of an entry is named after a hash of its key, which holds the dataset hash and the parameters
+    def __entry_path(self, key: tuple) -> str:
+        return os.path.join(self.__directory, hashlib.sha1(repr(key).encode()).hexdigest())
+
+    def __write_atomically(self, path: str, content: bytes) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir=self.__directory, prefix=".tmp-")
+
+        with os.fdopen(descriptor, "wb") as temporary_file:
+            temporary_file.write(content)
+
+        os.replace(temporary, path)
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
@@ -0,0 +1,91 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import numpy as np
+
+
+# This counts the points once for a fine base grid size, then gives the counts of any grid size that is a multiple
+# of the base by adding up the base blocks, without going through the points again.
+# Both grids start from the bottom left corner of the bounding box, so a block of the grid size k times the base
+# covers exactly k by k base blocks.
+class GridPyramid:
+    def __init__(self, points: np.ndarray, bbox: list, base_grid_size: float):
+        self.__bbox = bbox
+        self.__base_grid_size = base_grid_size
+
+        x_edges, y_edges = grid_edges(bbox, base_grid_size)
+        self.__levels = {1: count_points_per_block(points, x_edges, y_edges)}
+
+    # Returns the block counts for the grid size, or None if it isn't a multiple of the base grid size
+    def counts(self, grid_size: float):
+        factor = int(round(grid_size / self.__base_grid_size))
+
+        if factor < 1 or abs(factor * self.__base_grid_size - grid_size) > grid_size * 1e-9:
+            return None
+
+        if factor not in self.__levels:
+            x_edges, y_edges = grid_edges(self.__bbox, grid_size)
+            self.__levels[factor] = sum_blocks(self.__levels[1], factor, len(y_edges) - 1, len(x_edges) - 1)
+
+        return self.__levels[factor]
+
+    # Counts new points in the base blocks, the other grid sizes are added up again the next time they're asked for
+    def add_points(self, points: np.ndarray) -> None:
+        base_counts = self.__levels[1]
+        x_edges, y_edges = grid_edges(self.__bbox, self.__base_grid_size)
+        np.add.at(base_counts, block_indices(points, x_edges, y_edges), 1)
+        self.__levels = {1: base_counts}
+
+    @property
+    def base_grid_size(self) -> float:
+        return self.__base_grid_size
+
+    # The factors of the grid sizes worked out so far, with their counts
+    @property
+    def levels(self) -> dict:
+        return self.__levels
+
+
+# The edges of the blocks of the grid over the bounding box, which are the axis ticks plus the closing one
+def grid_edges(bbox: list, grid_size: float) -> tuple:
+    x_ticks = np.arange(bbox[0], bbox[2], grid_size)
+    y_ticks = np.arange(bbox[1], bbox[3], grid_size)
+    return np.append(x_ticks, x_ticks[-1] + grid_size), np.append(y_ticks, y_ticks[-1] + grid_size)
+
+
+# Adds up the counts of every factor by factor square of blocks, giving a matrix of rows by columns blocks.
+# The base counts are padded with empty blocks, or cropped, to cover exactly the coarser grid.
+def sum_blocks(counts: np.ndarray, factor: int, rows: int, columns: int) -> np.ndarray:
+    covered = np.zeros((rows * factor, columns * factor), dtype=counts.dtype)
+    base_rows = min(counts.shape[0], rows * factor)
+    base_columns = min(counts.shape[1], columns * factor)
+    covered[:base_rows, :base_columns] = counts[:base_rows, :base_columns]
+
+    return covered.reshape(rows, factor, columns, factor).sum(axis=(1, 3))
+
+
+# Counts the points falling within every block of the grid described by the edges, excluding the top and right edges.
+# Returns a matrix with a row for every block row starting from the bottom of the map, and a column for every block
+# column starting from the left.
+def count_points_per_block(points: np.ndarray, x_edges: np.ndarray, y_edges: np.ndarray) -> np.ndarray:
+    columns = len(x_edges) - 1
+    rows = len(y_edges) - 1
+    y_index, x_index = block_indices(points, x_edges, y_edges)
+
+    # Every point is given the flat index of its block, and the histogram of those indices is the crime count
+    counts = np.bincount(y_index * columns + x_index, minlength=rows * columns)
+
+    return counts.reshape(rows, columns)
+
+
+# The (row, column) of the block of every point, as two arrays, the points outside the grid are left out
+def block_indices(points: np.ndarray, x_edges: np.ndarray, y_edges: np.ndarray) -> tuple:
+    # The block index of a point is the index of the last edge lower or equal to it, so left <= point < right
+    x_index = np.searchsorted(x_edges, points[:, 0], side="right") - 1
+    y_index = np.searchsorted(y_edges, points[:, 1], side="right") - 1
+
+    inside = (x_index >= 0) & (x_index < len(x_edges) - 1) & (y_index >= 0) & (y_index < len(y_edges) - 1)
+
+    return y_index[inside], x_index[inside]
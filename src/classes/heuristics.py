@@ -0,0 +1,86 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+from classes.move_table import DIAGONAL_COST, STRAIGHT_COST, MoveTable
+
+# The heuristics a search can be given by name. Each one is a function taking the move table and the id of the end
+# point, and returning the heuristic of that end point, a function of a point id. They're all in the unit of the move
+# costs and never more than the actual cost, so the searches using them still find the shortest path.
+HEURISTICS = {}
+
+
+# Adds a heuristic to the ones that can be given by name
+def register_heuristic(name: str, heuristic_function) -> None:
+    HEURISTICS[name] = heuristic_function
+
+
+# Returns the heuristic of the end point. heuristic is either the name of a registered heuristic or a function like
+# the registered ones. With a weight above 1, the heuristic is multiplied by it: the search expands fewer points, and
+# the path it finds costs at most weight times the cost of the shortest path.
+def make_heuristic(heuristic, move_table: MoveTable, end_id: int, weight: float = 1.0):
+    if isinstance(heuristic, str):
+        if heuristic not in HEURISTICS:
+            raise ValueError("Unknown heuristic %r, it must be one of: %s" % (heuristic, ", ".join(HEURISTICS)))
+
+        heuristic = HEURISTICS[heuristic]
+
+    if weight < 1:
+        raise ValueError("The weight of the heuristic can't be lower than 1.")
+
+    end_heuristic = heuristic(move_table, end_id)
+
+    if weight == 1:
+        return end_heuristic
+
+    def weighted_heuristic(point_id: int) -> float:
+        return weight * end_heuristic(point_id)
+
+    return weighted_heuristic
+
+
+# The cost of the path to the end point if there were no yellow blocks: diagonal moves as long as both coordinates
+# differ, then vertical or horizontal moves. This is the default heuristic, the closest one to the actual cost.
+def octile_heuristic(move_table: MoveTable, end_id: int):
+    end_y, end_x = divmod(end_id, move_table.width)
+    width = move_table.width
+
+    def heuristic(point_id: int) -> float:
+        y, x = divmod(point_id, width)
+        dx = abs(x - end_x)
+        dy = abs(y - end_y)
+        return STRAIGHT_COST * (dx + dy) + (DIAGONAL_COST - 2 * STRAIGHT_COST) * min(dx, dy)
+
+    return heuristic
+
+
+# The straight line distance to the end point in lattice units, a diagonal move is longer than that
+def euclidean_heuristic(move_table: MoveTable, end_id: int):
+    end_y, end_x = divmod(end_id, move_table.width)
+    width = move_table.width
+
+    def heuristic(point_id: int) -> float:
+        y, x = divmod(point_id, width)
+        return ((x - end_x) ** 2 + (y - end_y) ** 2) ** 0.5
+
+    return heuristic
+
+
+# The Manhattan distance to the end point, scaled so a diagonal move, that goes 2 units for DIAGONAL_COST, is
+# never estimated higher than its cost
+def manhattan_heuristic(move_table: MoveTable, end_id: int):
+    end_y, end_x = divmod(end_id, move_table.width)
+    width = move_table.width
+    scale = min(STRAIGHT_COST, DIAGONAL_COST / 2)
+
+    def heuristic(point_id: int) -> float:
+        y, x = divmod(point_id, width)
+        return scale * (abs(x - end_x) + abs(y - end_y))
+
+    return heuristic
+
+
+register_heuristic("octile", octile_heuristic)
+register_heuristic("euclidean", euclidean_heuristic)
+register_heuristic("manhattan", manhattan_heuristic)
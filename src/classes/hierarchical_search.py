@@ -0,0 +1,287 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import heapq
+import math
+import weakref
+
+from classes.heuristics import octile_heuristic
+from classes.location_grid import LocationGrid
+from classes.move_table import DIRECTIONS, MoveTable
+from classes.node import a_star, informed_search
+from classes.search_stats import SearchStats
+
+# The directions of the moves going over a border from the cluster on its left and from the cluster below it,
+# diagonal moves included. The moves the other way are the same ones backward.
+RIGHTWARD = tuple(DIRECTIONS.index(step) for step in ((1, 0), (1, 1), (1, -1)))
+UPWARD = tuple(DIRECTIONS.index(step) for step in ((0, 1), (1, 1), (-1, 1)))
+
+# Along a border between two clusters, a run of crossing points shorter than this has a single entrance in its
+# middle, a longer one has an entrance at both of its ends and every ENTRANCE_SPACING points in between
+LONG_ENTRANCE = 6
+ENTRANCE_SPACING = 4
+
+# The path through the entrances is smoothed in its clusters and the clusters up to this many clusters away from them
+CORRIDOR_MARGIN = 1
+
+# The hierarchies already built, for every move table and cluster size
+_hierarchies = weakref.WeakKeyDictionary()
+
+
+# This is the abstract graph of the hierarchical search (HPA*). The lattice points are split into square clusters of
+# cluster_size by cluster_size points. The points where a move goes from a cluster to the next are the entrances,
+# and they're linked with the cost of the shortest path between them inside their cluster, worked out with the
+# moves and costs of the move table. A search first goes through the entrances only, then the path is searched again
+# on the move table in a corridor of clusters around it. The path is close to the shortest one, and often is it, but
+# isn't guaranteed to be it, so its cost is only an upper bound of the shortest one.
+class HierarchicalGraph:
+    def __init__(self, move_table: MoveTable, cluster_size: int = 10):
+        self.__move_table = move_table
+        self.__cluster_size = cluster_size
+        self.__version = move_table.version
+        self.__edges = {}  # For every entrance, a list of (entrance id, cost) it's linked to
+        self.__cluster_entrances = {}  # For every cluster (cx, cy), the ids of its entrances
+
+        self.__find_entrances()
+        self.__link_entrances()
+
+    # Searches the path between two points given by their ids, and returns the ids of the points of the path, its
+    # cost and the number of expanded points, like a_star(). When the abstract graph doesn't link the two points,
+    # for instance when they can only be linked by leaving a cluster and coming back, the whole map is searched
+    # instead. The corridor margin trades how close the path is to the shortest one for a faster search.
+    # When stats are given, every step of the search adds to them, and the path is the one of the last step.
+    def search(self, start_id: int, end_id: int, time_limit: float = 10, corridor_margin: int = CORRIDOR_MARGIN,
+               stats: SearchStats = None) -> tuple:
+        start_cluster = self.cluster(start_id)
+        end_cluster = self.cluster(end_id)
+        heuristic = octile_heuristic(self.__move_table, end_id)
+
+        # Going through the entrances would only make the path longer when the points are in neighbouring clusters,
+        # and the search is short anyway
+        if abs(start_cluster[0] - end_cluster[0]) <= 1 and abs(start_cluster[1] - end_cluster[1]) <= 1:
+            return a_star(self.__move_table, start_id, end_id, heuristic, time_limit, stats)
+
+        # The start and end points are linked to the entrances of their clusters for this search only
+        start_costs, start_expanded = self.__cluster_costs(start_id, self.__cluster_entrances.get(start_cluster, []))
+        end_costs, end_expanded = self.__cluster_costs(end_id, self.__cluster_entrances.get(end_cluster, []))
+        expanded = start_expanded + end_expanded
+
+        if stats is not None:
+            stats.nodes_expanded += expanded
+
+        extra_edges = {start_id: [(entrance, cost) for entrance, cost in start_costs.items() if entrance != start_id]}
+
+        for entrance, cost in end_costs.items():
+            if entrance != end_id:
+                extra_edges.setdefault(entrance, []).append((end_id, cost))
+
+        abstract_graph = _QueryGraph(self.__move_table, self.__edges, extra_edges)
+        abstract_path, cost, abstract_expanded = a_star(abstract_graph, start_id, end_id, heuristic, time_limit,
+                                                        stats)
+        expanded += abstract_expanded
+
+        if not abstract_path:
+            path, cost, full_expanded = a_star(self.__move_table, start_id, end_id, heuristic, time_limit, stats)
+            return path, cost, expanded + full_expanded
+
+        # The path only goes through the entrances, so it's smoothed by searching it again on the whole move table,
+        # only in its clusters and the ones around them. It's then the shortest path of this corridor, the abstract
+        # path being one of its paths.
+        margin = range(-corridor_margin, corridor_margin + 1)
+        corridor = {(cx + dx, cy + dy) for cx, cy in map(self.cluster, abstract_path) for dx in margin for dy in margin}
+        path, cost, corridor_expanded = a_star(_CorridorGraph(self, corridor), start_id, end_id, heuristic, time_limit,
+                                               stats)
+
+        return path, cost, expanded + corridor_expanded
+
+    # The cluster (cx, cy) of the point with the given id
+    def cluster(self, point_id: int) -> tuple:
+        i, j = self.__move_table.point(point_id)
+        return i // self.__cluster_size, j // self.__cluster_size
+
+    # Finds the entrances on the borders between every cluster and the ones on its right and above it. The points
+    # of a cluster with a move over the border, straight or diagonal, come in runs along the border, and the
+    # entrances are picked in every run. All the moves over the border of an entrance are edges of the graph.
+    def __find_entrances(self) -> None:
+        masks = self.__move_table.masks
+        costs = self.__move_table.costs
+        height, width = masks.shape
+        size = self.__cluster_size
+        linked = set()
+
+        for directions, border_positions, crossing_positions in (
+                (RIGHTWARD, range(size - 1, width - 1, size), height),
+                (UPWARD, range(size - 1, height - 1, size), width)):
+            crossing_mask = sum(1 << direction for direction in directions)
+
+            for border in border_positions:
+                # Each cluster along the border is scanned on its own, so an entrance never spans two clusters
+                for first in range(0, crossing_positions, size):
+                    run = []
+
+                    for position in range(first, min(first + size, crossing_positions) + 1):
+                        i, j = (border, position) if directions == RIGHTWARD else (position, border)
+
+                        if position < min(first + size, crossing_positions) and masks[j, i] & crossing_mask:
+                            run.append((i, j))
+                            continue
+
+                        for source in _run_entrances(run):
+                            for direction in directions:
+                                if not masks[source[1], source[0]] >> direction & 1:
+                                    continue
+
+                                di, dj = DIRECTIONS[direction]
+                                source_id = self.__move_table.point_id(source)
+                                target_id = self.__move_table.point_id((source[0] + di, source[1] + dj))
+
+                                # A diagonal move at the corner of 4 clusters goes over both borders
+                                if (source_id, target_id) in linked:
+                                    continue
+
+                                # The moves are the same both ways, so are their costs
+                                cost = float(costs[source[1], source[0], direction])
+                                linked.add((source_id, target_id))
+                                self.__add_entrance(source_id)
+                                self.__add_entrance(target_id)
+                                self.__edges[source_id].append((target_id, cost))
+                                self.__edges[target_id].append((source_id, cost))
+
+                        run = []
+
+    def __add_entrance(self, point_id: int) -> None:
+        if point_id not in self.__edges:
+            self.__edges[point_id] = []
+            self.__cluster_entrances.setdefault(self.cluster(point_id), []).append(point_id)
+
+    # Links every entrance to the other entrances of its cluster it can get to
+    def __link_entrances(self) -> None:
+        for entrances in self.__cluster_entrances.values():
+            for entrance in entrances:
+                entrance_costs, _ = self.__cluster_costs(entrance, entrances)
+
+                self.__edges[entrance].extend((target, cost) for target, cost in entrance_costs.items()
+                                              if target != entrance)
+
+    # Dijkstra's search from the point that never leaves its cluster, it stops once all the targets are reached.
+    # Returns the distance and the previous point of every point reached.
+    def __cluster_search(self, source_id: int, targets) -> tuple:
+        size = self.__cluster_size
+        cx, cy = self.cluster(source_id)
+        width = self.__move_table.width
+
+        remaining = set(targets)
+        distances = {source_id: 0}
+        previous = {source_id: None}
+        closed_list = set()
+        open_list = [(0, source_id)]
+
+        while open_list and remaining:
+            distance, current_id = heapq.heappop(open_list)
+
+            if current_id in closed_list:
+                continue
+
+            closed_list.add(current_id)
+            remaining.discard(current_id)
+
+            for next_id, move_cost in self.__move_table.neighbours(current_id):
+                j, i = divmod(next_id, width)
+
+                if i // size != cx or j // size != cy or next_id in closed_list:
+                    continue
+
+                next_distance = distance + move_cost
+
+                if next_distance < distances.get(next_id, math.inf):
+                    distances[next_id] = next_distance
+                    previous[next_id] = current_id
+                    heapq.heappush(open_list, (next_distance, next_id))
+
+        return distances, previous, closed_list
+
+    # The cost of the shortest path inside the cluster from the point to each of the targets it can get to, and
+    # the number of expanded points
+    def __cluster_costs(self, source_id: int, targets) -> tuple:
+        distances, _, closed_list = self.__cluster_search(source_id, targets)
+        return {target: distances[target] for target in targets if target in closed_list}, len(closed_list)
+
+    @property
+    def move_table(self) -> MoveTable:
+        return self.__move_table
+
+    @property
+    def cluster_size(self) -> int:
+        return self.__cluster_size
+
+    # The version of the move table the graph was built for
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def entrance_count(self) -> int:
+        return len(self.__edges)
+
+
+# The move table with only the moves between the points of the given clusters, so a_star() only searches them
+class _CorridorGraph:
+    def __init__(self, graph: HierarchicalGraph, clusters: set):
+        self.move_table = graph.move_table  # The searches borrow the arrays of this move table
+        self.width = graph.move_table.width
+        self.height = graph.move_table.height
+        self.__cluster_size = graph.cluster_size
+        self.__clusters = clusters
+
+    def neighbours(self, point_id: int) -> list:
+        size, width, clusters = self.__cluster_size, self.width, self.__clusters
+        return [(next_id, cost) for next_id, cost in self.move_table.neighbours(point_id)
+                if ((next_id % width) // size, (next_id // width) // size) in clusters]
+
+
+# The points of a run of crossing points that are made entrances
+def _run_entrances(run: list) -> list:
+    if len(run) < LONG_ENTRANCE:
+        return run[len(run) // 2:len(run) // 2 + 1]
+
+    return run[:-1:ENTRANCE_SPACING] + run[-1:]
+
+
+# The abstract graph of a single search, the start and end points are linked to it with extra edges.
+# It has the neighbours() and the size of a move table, so a_star() can search it.
+class _QueryGraph:
+    def __init__(self, move_table: MoveTable, edges: dict, extra_edges: dict):
+        self.move_table = move_table  # The searches borrow the arrays of this move table
+        self.width = move_table.width
+        self.height = move_table.height
+        self.__edges = edges
+        self.__extra_edges = extra_edges
+
+    def neighbours(self, point_id: int) -> list:
+        return self.__edges.get(point_id, []) + self.__extra_edges.get(point_id, [])
+
+
+# Returns the hierarchical graph of the move table, it's only built again when the move table changed since
+def hierarchy(move_table: MoveTable, cluster_size: int = 10) -> HierarchicalGraph:
+    graphs = _hierarchies.setdefault(move_table, {})
+    graph = graphs.get(cluster_size)
+
+    if graph is None or graph.version != move_table.version:
+        graph = graphs[cluster_size] = HierarchicalGraph(move_table, cluster_size)
+
+    return graph
+
+
+# This is the hierarchical search mode of informed_search(), it gives the same list of nodes to draw on the map.
+# The path may be a bit longer than the shortest one, which is told with its cost.
+# The set_coordinates_validity() of the map must have been called.
+def hierarchical_search(graph: LocationGrid, start_coords: tuple, end_coords: tuple, cluster_size: int = 10,
+                        stats: SearchStats = None) -> list:
+    graph_search = hierarchy(graph.move_table, cluster_size).search
+
+    def search(start_id: int, end_id: int) -> tuple:
+        return graph_search(start_id, end_id, stats=stats)
+
+    return informed_search(graph, start_coords, end_coords, search=search, exact=False)
@@ -0,0 +1,254 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import heapq
+import math
+import time
+import weakref
+
+import numpy as np
+
+from classes.location_grid import LocationGrid
+from classes.move_table import DIRECTIONS, MoveTable
+from classes.heuristics import make_heuristic
+from classes.node import informed_search
+from classes.search_stats import SearchStats
+
+# The directions making up every diagonal direction, the vertical one and the horizontal one
+COMPONENTS = {k: (DIRECTIONS.index((0, dj)), DIRECTIONS.index((di, 0)))
+              for k, (di, dj) in enumerate(DIRECTIONS) if di != 0 and dj != 0}
+
+# The tables already built, for every move table
+_jump_tables = weakref.WeakKeyDictionary()
+
+
+# This is what the jump point search reads the moves from, as lists since they're read one point at a time.
+# For every point and every direction k it was reached in, successors has the bit m set when the move m has to be
+# tried from the point, and the bit k of forced is set when one of these moves isn't one of the natural moves of
+# the open map (k, and its two components if it's a diagonal). Both come from the costs of the move table, so the
+# moves along the yellow blocks and the moves that aren't valid are taken into account.
+class JumpTable:
+    def __init__(self, move_table: MoveTable):
+        height, width = move_table.masks.shape
+        self.version = move_table.version
+        self.width = width
+        self.offsets = [dj * width + di for di, dj in DIRECTIONS]
+        self.masks = move_table.masks.ravel().tolist()
+        self.costs = move_table.costs.reshape(-1, len(DIRECTIONS)).tolist()
+
+        # The costs with 2 points of margin around the map, where nothing can be reached
+        padded_costs = np.full((height + 4, width + 4, len(DIRECTIONS)), np.inf)
+        padded_costs[2:-2, 2:-2] = move_table.costs
+
+        # The cost of the move m from the point at (di, dj) of every point
+        def cost_from(di: int, dj: int, m: int) -> np.ndarray:
+            return padded_costs[2 + dj:2 + dj + height, 2 + di:2 + di + width, m]
+
+        successors = np.zeros((height, width, len(DIRECTIONS)), dtype=np.uint8)
+        forced = np.zeros((height, width), dtype=np.uint8)
+
+        for k, (dx, dy) in enumerate(DIRECTIONS):
+            natural = (1 << k) | sum(1 << component for component in COMPONENTS.get(k, ()))
+            to_point = cost_from(-dx, -dy, k)
+
+            for m, (ex, ey) in enumerate(DIRECTIONS):
+                if (ex, ey) == (-dx, -dy):
+                    continue
+
+                # The move m is skipped when the neighbour it leads to can be reached from the previous point without
+                # going through the point, in one or two moves, for less. After a vertical or horizontal move, it's
+                # also skipped for the same cost when the other way goes diagonally first, so that of all the paths
+                # made of the same moves only the ones going diagonally first are kept.
+                through_point = to_point + cost_from(0, 0, m)
+                around = np.full((height, width), np.inf)
+                around_diagonal_first = np.full((height, width), np.inf)
+                rx, ry = dx + ex, dy + ey
+
+                if (rx, ry) in DIRECTIONS:
+                    around = cost_from(-dx, -dy, DIRECTIONS.index((rx, ry)))
+                    around_diagonal_first = around
+
+                for a, (ax, ay) in enumerate(DIRECTIONS):
+                    if a != k and (rx - ax, ry - ay) in DIRECTIONS:
+                        other_way = cost_from(-dx, -dy, a) + cost_from(ax - dx, ay - dy,
+                                                                      DIRECTIONS.index((rx - ax, ry - ay)))
+                        around = np.minimum(around, other_way)
+
+                        if a in COMPONENTS:
+                            around_diagonal_first = np.minimum(around_diagonal_first, other_way)
+
+                skipped = around < through_point
+
+                if k not in COMPONENTS:
+                    skipped |= around_diagonal_first <= through_point
+
+                needed = np.isfinite(cost_from(0, 0, m)) & ~skipped
+                successors[..., k] |= needed.astype(np.uint8) << m
+
+                if not natural >> m & 1:
+                    forced |= needed.astype(np.uint8) << k
+
+        self.successors = successors.reshape(-1, len(DIRECTIONS)).tolist()
+        self.forced = forced.ravel().tolist()
+
+
+# Returns the jump table of the move table, it's only built again when the move table changed since
+def jump_table(move_table: MoveTable) -> JumpTable:
+    table = _jump_tables.get(move_table)
+
+    if table is None or table.version != move_table.version:
+        table = _jump_tables[move_table] = JumpTable(move_table)
+
+    return table
+
+
+# This is the A* search with jump point search (JPS), it takes the same arguments and returns the same as a_star().
+# The search doesn't expand every point, it jumps in straight lines and diagonals until something could change the
+# way to go: the end point, or a point where a yellow block, an edge or an invalid point makes a move needed that
+# wouldn't be in the open map. Which moves are needed is worked out from the move table, so the rules of the moves
+# and their costs are kept, and the path costs the same as the one of a_star(). The stats count the jump points.
+def jump_point_search(move_table: MoveTable, start_id: int, end_id: int, heuristic, time_limit: float = None,
+                      stats: SearchStats = None) -> tuple:
+    table = jump_table(move_table)
+
+    # The jump points the search goes to from a jump point, with the cost to get there and the direction it jumped in
+    def jumps(point_id: int) -> list:
+        found = []
+
+        for k in _directions(table, point_id, direction[point_id]):
+            jump = _jump(table, point_id, k, end_id)
+
+            if jump is not None:
+                found.append((jump[0], jump[1], k))
+
+        return found
+
+    push, pop = heapq.heappush, heapq.heappop
+
+    # The jumps are timed as the neighbours of the points
+    if stats is not None:
+        jumps, heuristic = stats.timed_neighbours(jumps), stats.timed_heuristic(heuristic)
+        push, pop = stats.push, stats.pop
+
+    # The open list is a binary heap of (f, g, point id), the closed list is a set of the points already expanded
+    open_list = []
+    push(open_list, (heuristic(start_id), 0, start_id))
+    closed_list = set()
+
+    # The lowest cost found so far to every jump point, the jump point it came from and the direction it came in
+    best_g = {start_id: 0}
+    previous = {start_id: None}
+    direction = {start_id: None}
+
+    search_time = time.time()
+    start_time = time.perf_counter()
+
+    while open_list:
+        _, g, current_id = pop(open_list)
+
+        if current_id in closed_list:
+            continue
+
+        closed_list.add(current_id)
+
+        if stats is not None:
+            stats.expanded(current_id)
+
+        if current_id == end_id:
+            path = _fill_path(table, previous, end_id)
+
+            if stats is not None:
+                stats.finished(path, g, len(closed_list), start_time)
+
+            return path, g, len(closed_list)
+
+        for next_id, jump_cost, k in jumps(current_id):
+            if next_id in closed_list:
+                continue
+
+            next_g = g + jump_cost
+
+            if next_g >= best_g.get(next_id, math.inf):
+                continue
+
+            if stats is not None and next_id in best_g:
+                stats.duplicate_pushes += 1
+
+            best_g[next_id] = next_g
+            previous[next_id] = current_id
+            direction[next_id] = k
+
+            push(open_list, (next_g + heuristic(next_id), next_g, next_id))
+
+        if time_limit is not None and time.time() - search_time > time_limit:
+            raise TimeoutError("The optimal path was not found in %s seconds." % time_limit)
+
+    if stats is not None:
+        stats.finished([], None, len(closed_list), start_time)
+
+    # The open list emptied and we haven't found a path
+    return [], None, len(closed_list)
+
+
+# The directions to jump in from a jump point, every valid move from the start and only the needed ones after
+def _directions(table: JumpTable, point_id: int, k) -> list:
+    mask = table.masks[point_id] if k is None else table.successors[point_id][k]
+    return [m for m in range(len(DIRECTIONS)) if mask >> m & 1]
+
+
+# Moves from the point in the direction k until the next jump point, and returns its id and the cost to get there.
+# A point is a jump point when it's the end point, or when a move that isn't natural is needed from it.
+# Returns None if the jump ends without finding one.
+def _jump(table: JumpTable, point_id: int, k: int, end_id: int):
+    masks = table.masks
+    costs = table.costs
+    forced = table.forced
+    offset = table.offsets[k]
+    components = COMPONENTS.get(k)
+    cost = 0
+
+    while masks[point_id] >> k & 1:
+        cost += costs[point_id][k]
+        point_id += offset
+
+        if point_id == end_id or forced[point_id] >> k & 1:
+            return point_id, cost
+
+        # A diagonal jump stops where a vertical or horizontal jump from it finds a jump point
+        if components is not None and any(_jump(table, point_id, component, end_id) for component in components):
+            return point_id, cost
+
+    return None
+
+
+# Follows the jump points back to the start, with all the points in between them
+def _fill_path(table: JumpTable, previous: dict, end_id: int) -> list:
+    path = [end_id]
+    current_id = end_id
+
+    while previous[current_id] is not None:
+        previous_id = previous[current_id]
+        (previous_j, previous_i), (j, i) = divmod(previous_id, table.width), divmod(current_id, table.width)
+        di, dj = (i > previous_i) - (i < previous_i), (j > previous_j) - (j < previous_j)
+        offset = dj * table.width + di
+
+        while current_id != previous_id:
+            current_id -= offset
+            path.append(current_id)
+
+    return path[::-1]
+
+
+# This is the jump point search mode of informed_search(), it gives the same list of nodes to draw on the map.
+# The set_coordinates_validity() of the map must have been called.
+def jump_search(graph: LocationGrid, start_coords: tuple, end_coords: tuple, heuristic="octile",
+                weight: float = 1.0, stats: SearchStats = None) -> list:
+    move_table = graph.move_table
+
+    def search(start_id: int, end_id: int) -> tuple:
+        return jump_point_search(move_table, start_id, end_id, make_heuristic(heuristic, move_table, end_id, weight),
+                                 time_limit=10, stats=stats)
+
+    return informed_search(graph, start_coords, end_coords, search=search)
@@ -0,0 +1,125 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import math
+import os
+
+import numpy as np
+
+from classes.distance_field import shortest_paths
+from classes.heuristics import octile_heuristic
+from classes.move_table import MoveTable
+
+# The files a set of landmarks is saved in
+DISTANCES_FILE = "distances.npy"
+LANDMARKS_FILE = "landmarks.npy"
+
+# The float32 distances are rounded, so the bounds worked out from them are lowered by this much of the distances to
+# stay below the actual cost
+ROUNDING_MARGIN = 1e-6
+
+
+# This is the ALT heuristic (A*, landmarks and triangle inequality). The cost of the shortest path from a few
+# landmark points to every point of the map is worked out once. Since the moves are the same both ways, for any
+# landmark L the cost between a point and the end point is at least |d(L, end) - d(L, point)|, which is often far
+# closer to the actual cost than a distance on the map is, around the yellow blocks especially.
+# The distances are a float32 matrix with a row per point id and a column per landmark, inf where a landmark can't
+# be reached. They only hold for the move table they were built from.
+class Landmarks:
+    def __init__(self, landmark_ids: np.ndarray, distances: np.ndarray):
+        self.__landmark_ids = landmark_ids
+        self.__distances = distances
+
+    # The heuristic of the end point, it can be given to informed_search() like the ones of the registry.
+    # The bound of a point is only worked out the first time the search asks for it, from the distances of that
+    # point alone, then it's kept for the rest of the search.
+    def heuristic(self, move_table: MoveTable, end_id: int):
+        # The memory maps are read as arrays, only the rows of the points asked for are read from the disk
+        distances = np.asarray(self.__distances)
+        end_distances = distances[end_id].tolist()
+
+        # The landmarks that can't reach the end point can't tell anything about it
+        reached = [(landmark, distance) for landmark, distance in enumerate(end_distances) if distance != math.inf]
+        octile = octile_heuristic(move_table, end_id)
+        bounds = {}
+
+        def heuristic(point_id: int) -> float:
+            bound = bounds.get(point_id)
+
+            if bound is None:
+                # The octile distance is also a bound, and it's the better one close to the end point
+                bound = octile(point_id)
+                point_distances = distances[point_id].tolist()
+
+                for landmark, end_distance in reached:
+                    point_distance = point_distances[landmark]
+
+                    # A point a landmark doesn't reach when it reaches the end point can't get to the end point
+                    if point_distance == math.inf:
+                        bound = math.inf
+                        break
+
+                    landmark_bound = abs(point_distance - end_distance) \
+                        - ROUNDING_MARGIN * (point_distance + end_distance)
+
+                    if landmark_bound > bound:
+                        bound = landmark_bound
+
+                bounds[point_id] = bound
+
+            return bound
+
+        return heuristic
+
+    # Saves the landmarks in the directory, they can then be loaded as memory maps
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, LANDMARKS_FILE), self.__landmark_ids)
+        np.save(os.path.join(directory, DISTANCES_FILE), self.__distances)
+
+    # Loads the landmarks saved in the directory, the distances are only read from the disk when they're needed
+    @staticmethod
+    def load(directory: str, mmap_mode: str = "r"):
+        return Landmarks(np.load(os.path.join(directory, LANDMARKS_FILE)),
+                         np.load(os.path.join(directory, DISTANCES_FILE), mmap_mode=mmap_mode))
+
+    @property
+    def landmark_ids(self) -> np.ndarray:
+        return self.__landmark_ids
+
+    @property
+    def distances(self) -> np.ndarray:
+        return self.__distances
+
+
+# Chooses the landmarks and works out their distances to every point of the move table.
+# Each landmark is the point the farthest from the ones already chosen, so they end up around the edges of the map,
+# where they give the best bounds. The first one is the farthest from the first valid point.
+def build_landmarks(move_table: MoveTable, count: int = 8) -> Landmarks:
+    valid_ids = np.flatnonzero(move_table.masks.ravel())
+    distances = np.full((move_table.width * move_table.height, count), np.inf, dtype=np.float32)
+    landmark_ids = []
+
+    if len(valid_ids) == 0:
+        return Landmarks(np.array(landmark_ids, dtype=np.int64), distances[:, :0])
+
+    # The distance of every point to the closest landmark, the points that can't be reached count as the farthest
+    # so that every part of the map gets a landmark
+    closest = shortest_paths(move_table, int(valid_ids[0]))[0]
+
+    for landmark in range(count):
+        candidates = np.where(np.isfinite(closest[valid_ids]), closest[valid_ids], np.finfo(np.float64).max)
+        landmark_id = int(valid_ids[np.argmax(candidates)])
+
+        if landmark_id in landmark_ids:
+            break
+
+        landmark_distances, _ = shortest_paths(move_table, landmark_id)
+        distances[:, landmark] = landmark_distances
+        landmark_ids.append(landmark_id)
+
+        closest = landmark_distances if landmark == 0 else np.minimum(closest, landmark_distances)
+
+    return Landmarks(np.array(landmark_ids, dtype=np.int64), distances[:, :len(landmark_ids)])
@@ -4,75 +4,116 @@
 # For COMP 472 Section ABKX – Summer 2020
 # --------------------------------------------------------
 import shapefile as shp
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import math
-from matplotlib import colors
+
+from classes.grid_cache import GridCache
+from classes.grid_pyramid import GridPyramid, block_indices, count_points_per_block
+from classes.move_table import MoveTable, build_move_table, points_around_blocks
+from classes.shapefile_points import read_points
+
+# The matplotlib backends the graphs are drawn with: in a new window, in the PyCharm plot panel, or only in files.
+# matplotlib is only imported when a graph is drawn, so the searches don't need a display or its start up time.
+WINDOWED_BACKEND = "TkAgg"
+PANEL_BACKEND = "module://backend_interagg"
+HEADLESS_BACKEND = "Agg"
+
+# When more than this fraction of the points of the map can have their moves changed by the blocks changing color,
+# the moves of the whole map are worked out again instead of point by point
+FULL_UPDATE_FRACTION = 0.25
 
 
 class LocationGrid:
     # These are private member variables that aren't initialized in the constructor
+    __backend: str
     __axis_font_size: str
     __x_axis_angle: int
     __alignment: str
-    __block_graph_data: list
-    __block_graph_data_formatted: list
-    __blocked_blocks: list
-    __invalid_coordinates: list
+    __blocked_matrix: np.ndarray
+    __invalid_matrix: np.ndarray
+    __move_table: MoveTable
     __x_axis_ticks: np.ndarray
     __y_axis_ticks: np.ndarray
-    __block_df: pd.DataFrame
+    __x_lattice: np.ndarray
+    __y_lattice: np.ndarray
+    __block_counts: np.ndarray
+    __sorted_counts: np.ndarray
+    __count_order: np.ndarray
+    __validity_threshold_count: float
+    __changed_cells: np.ndarray
     __crime_count: int
+    __count_square_sum: int
     __crime_mean: float
     __crime_standard_deviation: float
 
-    def __init__(self, shapefile: str, grid_size: float = 0.002, threshold: float = 0.5):
-        # All the data needed for the graphs are read here from the file
-        with shp.Reader(shapefile, "r", encoding="ANSI") as sf:
-            # The points are retrieved and saved to be later used to draw the scatter graph
-            self.__points_x = [point.points[0][0] for point in sf.shapes()]
-            self.__points_y = [point.points[0][1] for point in sf.shapes()]
-            self.__area_coordinates = sf.bbox  # These are the coordinates delimiting the whole map
-            # Fields are column name and records are information related to every crime eg: date, type, etc.
-            fields = [x[0] for x in sf.fields][1:]
-            records = [y[:] for y in sf.records()]
-            points = [s.points[0] for s in sf.shapes()]  # There are the coordinates of each crime
-            self.__crime_df = pd.DataFrame(columns=fields, data=records)  # DataFrame with the crime info
-            self.__crime_df = self.__crime_df.assign(Coordinates=points)  # We add the crime coordinates to the df
+    # The derived grids are kept on disk between runs when a cache is given. When a base grid size is given, the
+    # points are counted once for it and the grid sizes that are multiples of it are derived from these counts.
+    def __init__(self, shapefile: str, grid_size: float = 0.002, threshold: float = 0.5, cache: GridCache = None,
+                 base_grid_size: float = None):
+        # Only the coordinates of the crimes are needed for the graphs, they're read here straight from the file.
+        # The other information about the crimes is read only if crime_df is used.
+        self.__shapefile = shapefile
+        self.__crime_df = None
+        self.__crime_points, self.__area_coordinates = read_points(shapefile)  # The bbox delimits the whole map
+        self.__record_count = len(self.__crime_points)
+
+        # The points added after the file was read are appended to this buffer, which has room for more of them
+        self.__point_buffer = self.__crime_points
+
+        # The points are saved to be later used to draw the scatter graph
+        self.__points_x = self.__crime_points[:, 0]
+        self.__points_y = self.__crime_points[:, 1]
+
+        self.__cache = cache
+        self.__dataset_key = cache.dataset_key(shapefile) if cache is not None else None
+
+        self.__pyramid = None
+
+        if base_grid_size is not None:
+            self.build_pyramid(base_grid_size)
+
         # The graphs to be drawn are by default in a new window
         self.windowed_graph(True)
 
         self.__search_path_data = []
+        self.__explored_data = []
 
         self.threshold = threshold
         self.grid_size = grid_size
 
-    # This will display the block graph, the one with the crime rates
-    def show_block(self) -> None:
+    # This will display the block graph, the one with the crime rates.
+    # When a file is given, the graph is saved to it instead, as an image of the format of its extension.
+    def show_block(self, file: str = None) -> None:
+        from matplotlib import colors
+
+        plt = self.__pyplot()
         self.__format_axis()  # Depending on the grid size, the axis labels' style changes for clarity
 
         fig, block_plot = plt.subplots()
 
-        if plt.get_backend() == "TkAgg":  # The title is only printed in windowed graphs, they overlap otherwise
+        if self.__backend != PANEL_BACKEND:  # The title isn't printed in the plot panel, they overlap there
             fig.suptitle("Block Graph: " + str(self.__grid_size) + " grid size; " + str(self.__threshold) +
                          " threshold")
 
         color_map = colors.ListedColormap(['indigo', 'yellow'])
 
-        # quantile() is a pandas function that returns the value at a specific percentile eg: 0.5 returns the median
         # The bounds include the minimum, the threshold and the maximum.
-        bounds = [0, float(self.__block_df["Crime Count"].quantile(self.__threshold)),
-                  int(self.__block_df["Crime Count"].max())]
+        bounds = [0, self.threshold_count, int(self.__sorted_counts[-1])]
         norm = colors.BoundaryNorm(bounds, color_map.N)
 
         plt.grid(True, linewidth=1.5, color="k")
         # This creates the image with the crime rates, it uses a colormap and coordinates for its boundaries
-        block_plot.imshow(np.array(self.__block_graph_data_formatted), cmap=color_map, norm=norm, aspect="auto",
+        # imshow() draws the first row at the top, so the count matrix is drawn upside down
+        block_plot.imshow(self.__block_counts[::-1], cmap=color_map, norm=norm, aspect="auto",
                           extent=[self.__x_axis_ticks[0], self.__x_axis_ticks[-1] + self.__grid_size,
                                   self.__y_axis_ticks[0], self.__y_axis_ticks[-1] + self.__grid_size])
 
+        # The points a search expanded are drawn under the path, when they were recorded
+        if self.__explored_data:
+            explored = [self.to_coordinates(self.__move_table.point(point_id)) for point_id in self.__explored_data]
+            plt.scatter([coords[0] for coords in explored], [coords[1] for coords in explored],
+                        s=6, color="cyan", alpha=0.6, zorder=2)
+
         # The red search line is only plotted when we found a shortest path,
         # the coordinates of each node in the list is used
         if self.__search_path_data:
@@ -82,31 +123,80 @@ class LocationGrid:
 
         # This configures the x and y axis ticks before each drawing of the graph,
         # because it seems to get flushed after every call of plt.show()
-        self.__set_axis_ticks()
+        self.__set_axis_ticks(plt)
 
         # We don't want the graph to block, so we can display two graphs at the same time.
-        plt.show(block=False)
+        self.__show(plt, fig, file)
+
+    # This draws a heatmap of a value for every lattice point, like the costs of a distance field, over the grid.
+    # The matrix is by (j, i) like the move table, and the points with an inf or nan value aren't colored.
+    def show_distance_field(self, distances: np.ndarray, title: str = "Distance Field", file: str = None) -> None:
+        plt = self.__pyplot()
+        self.__format_axis()
+
+        fig, field_plot = plt.subplots()
+
+        if self.__backend != PANEL_BACKEND:
+            fig.suptitle(title + ": " + str(self.__grid_size) + " grid size; " + str(self.__threshold) + " threshold")
+
+        plt.grid(True, linewidth=0.5, color="k")
+
+        # Every point is drawn as a cell centered on it, and the first row is the bottom one
+        half_size = self.__grid_size / 2
+        image = field_plot.imshow(np.ma.masked_invalid(distances), cmap="viridis_r", origin="lower", aspect="auto",
+                                  extent=[self.__x_lattice[0] - half_size, self.__x_lattice[-1] + half_size,
+                                          self.__y_lattice[0] - half_size, self.__y_lattice[-1] + half_size])
+        fig.colorbar(image, ax=field_plot)
+
+        # The path found last is drawn over the field too
+        if self.__search_path_data:
+            plt.plot([coord.coordinates[0] for coord in self.__search_path_data],
+                     [coord.coordinates[1] for coord in self.__search_path_data],
+                     color="red", linewidth=2)
+
+        self.__set_axis_ticks(plt)
+
+        self.__show(plt, fig, file)
 
     # This is the function that draws the scatter plot for the positions of the crimes
-    def show_scatter(self) -> None:
+    def show_scatter(self, file: str = None) -> None:
+        plt = self.__pyplot()
         self.__format_axis()
 
         fig, scatter_plot = plt.subplots()
 
-        if plt.get_backend() == "TkAgg":
+        if self.__backend != PANEL_BACKEND:
             fig.suptitle("Scatter Graph: " + str(self.__grid_size) + " grid size")
 
         # This sets the boundaries of the graph
         plt.axis([self.__area_coordinates[0], self.__area_coordinates[2], self.__area_coordinates[1],
                   self.__area_coordinates[3]])
 
-        self.__set_axis_ticks()
+        self.__set_axis_ticks(plt)
 
         plt.grid(True)
 
         scatter_plot.scatter(self.__points_x, self.__points_y)
 
-        plt.show(block=False)
+        self.__show(plt, fig, file)
+
+    # pyplot, with the backend of the graphs
+    def __pyplot(self):
+        import matplotlib
+
+        matplotlib.use(self.__backend)
+
+        import matplotlib.pyplot as plt
+        return plt
+
+    # Shows the graph without blocking, or saves it to the file and closes it
+    @staticmethod
+    def __show(plt, fig, file: str) -> None:
+        if file is None:
+            plt.show(block=False)
+        else:
+            fig.savefig(file, bbox_inches="tight")
+            plt.close(fig)
 
     # Depending on the grid size, the axis labels are formatted differently
     def __format_axis(self) -> None:
@@ -124,68 +214,217 @@ class LocationGrid:
             self.__alignment = "center"
 
     # Needed before every plt.show() to draw the graphs
-    def __set_axis_ticks(self) -> None:
+    def __set_axis_ticks(self, plt) -> None:
         plt.xticks(self.__x_axis_ticks, rotation=self.__x_axis_angle, horizontalalignment=self.__alignment,
                    size=self.__axis_font_size)
         plt.yticks(self.__y_axis_ticks, size=self.__axis_font_size)
 
-    # This will generate two lists, one with the coordinates of all the yellow blocks for the given threshold,
-    # and another with all the invalid points of the map; coordinates that can't be used in the path search
+    # This will generate two matrices, one telling which blocks are yellow for the given threshold,
+    # and another telling which points of the map are invalid; coordinates that can't be used in the path search
     def set_coordinates_validity(self):
-        threshold = float(self.__block_df["Crime Count"].quantile(self.__threshold))  # Threshold crime count
-        self.__blocked_blocks = []
-        self.__invalid_coordinates = []
-
-        # block_data = [[x1, y1, x2, y2], crime_count], block_graph_data contains the crime count of every block.
-        # This loop will populate blocked_blocks with only the block that have a crime count above the threshold.
-        # Which means this is a list of block the search path will have to take into account.
-        for block_data in self.__block_graph_data:
-            if block_data[1] > threshold:
-                self.__blocked_blocks.append(block_data[0])
-
-        # Here we'll iterate though all the coordinates of the graph to see if it is adjacent to a yellow block.
-        for i in range(len(self.__y_axis_ticks) + 1):
-            y_coord = self.__y_axis_ticks[i] if i < len(self.__y_axis_ticks) \
-                else self.__y_axis_ticks[i - 1] + self.__grid_size
-
-            for j in range(len(self.__x_axis_ticks) + 1):
-                x_coord = self.__x_axis_ticks[j] if j < len(self.__x_axis_ticks) \
-                    else self.__x_axis_ticks[j - 1] + self.__grid_size
-                coords = (x_coord, y_coord)
-                block_adjacency_count = 0
-
-                # If the coordinates are not on the boundary edges
-                if 0 < i < len(self.__y_axis_ticks) and 0 < j < len(self.__x_axis_ticks):
-                    for block in self.__blocked_blocks:
-                        if x_coord in block and y_coord in block:
-                            block_adjacency_count += 1
-
-                    # If the coordinate is in between 4 yellow blocks, then it is invalid
-                    if block_adjacency_count >= 4:
-                        self.__invalid_coordinates.append(coords)
-
-                # If the coordinates are on the boundary edges, except for corners
-                elif (i == 0 or i == len(self.__y_axis_ticks)) != (j == 0 or j == len(self.__x_axis_ticks)):  # XOR
-                    for block in self.__blocked_blocks:
-                        if x_coord in block and y_coord in block:
-                            block_adjacency_count += 1
-
-                    # If the coordinates are between 2 yellow blocks, it is invalid
-                    if block_adjacency_count >= 2:
-                        self.__invalid_coordinates.append(coords)
-
-                # If the coordinates are in the corners
-                else:
-                    for block in self.__blocked_blocks:
-                        if x_coord in block and y_coord in block:
-                            block_adjacency_count += 1
-
-                    # If they're in one yellow block, it means they're invalid
-                    if block_adjacency_count >= 1:
-                        self.__invalid_coordinates.append(coords)
+        threshold = self.threshold_count  # Threshold crime count
+
+        # When only the threshold changed since the last time, only the blocks that changed color are looked at
+        if self.__validity_threshold_count is not None:
+            self.__update_threshold(threshold)
+            return
+
+        self.__validity_threshold_count = threshold
+        self.__changed_cells = None
+
+        # The matrices and moves may have already been computed for the same map and threshold in a previous run
+        cached = self.__cache_load("validity", self.__threshold)
+
+        if cached is not None:
+            self.__blocked_matrix = cached["blocked"]
+            self.__invalid_matrix = cached["invalid"]
+            self.__move_table = MoveTable(cached["masks"], cached["costs"])
+            return
+
+        rows, columns = self.__block_counts.shape
+
+        # A block is yellow when its crime count is above the threshold, those are the blocks the search path will
+        # have to take into account. The matrix is indexed by (row, column) from the bottom left block, and it is
+        # padded with blue blocks all around so that every point of the map has exactly four surrounding blocks.
+        self.__blocked_matrix = np.pad(self.__block_counts > threshold, 1, mode="constant", constant_values=False)
+
+        # There's a point for every grid line intersection, so one more row and column than there are blocks
+        self.__invalid_matrix = np.zeros((rows + 1, columns + 1), dtype=bool)
+        self.__set_invalid_points(0, rows + 1, 0, columns + 1)
+
+        # Every valid move and its cost is worked out once here, the search then only has to look them up
+        self.__move_table = build_move_table(self.blocked_matrix, self.__invalid_matrix)
+
+        self.__cache_store({"blocked": self.__blocked_matrix, "invalid": self.__invalid_matrix,
+                            "masks": self.__move_table.masks, "costs": self.__move_table.costs},
+                           "validity", self.__threshold)
+
+    # Works out which points in the rows [i1, i2) and columns [j1, j2) of the graph are invalid, from the number of
+    # yellow blocks they're adjacent to, for the whole window at once
+    def __set_invalid_points(self, i1: int, i2: int, j1: int, j2: int) -> None:
+        rows, columns = self.__block_counts.shape
+
+        # These are the four blocks surrounding every point (i, j) in the padded matrix, summed
+        blocks = self.__blocked_matrix[i1:i2 + 1, j1:j2 + 1].astype(np.uint8)
+        block_adjacency_count = blocks[:-1, :-1] + blocks[:-1, 1:] + blocks[1:, :-1] + blocks[1:, 1:]
+
+        # If the point is not on the boundary edges, it is invalid in between 4 yellow blocks, if it is on the
+        # boundary edges, except for corners, between 2 yellow blocks, and if it is in the corners in one yellow block
+        row_edges = np.isin(np.arange(i1, i2), (0, rows)).astype(np.uint8)
+        column_edges = np.isin(np.arange(j1, j2), (0, columns)).astype(np.uint8)
+        required_count = 4 >> (row_edges[:, None] + column_edges[None, :])
+
+        self.__invalid_matrix[i1:i2, j1:j2] = block_adjacency_count >= required_count
+
+    # Works out again whether the points with the given ids are invalid, like __set_invalid_points() does for a window
+    def __set_invalid_points_at(self, point_ids: np.ndarray) -> None:
+        rows, columns = self.__block_counts.shape
+        i, j = np.divmod(point_ids, columns + 1)
+
+        # The point in the row i and the column j is surrounded by the blocks of the rows i and i + 1 and the
+        # columns j and j + 1 of the padded matrix
+        blocked = self.__blocked_matrix
+        block_adjacency_count = blocked[i, j].astype(np.uint8) + blocked[i, j + 1] + blocked[i + 1, j] \
+            + blocked[i + 1, j + 1]
+
+        required_count = 4 >> (((i == 0) | (i == rows)).astype(np.uint8) + ((j == 0) | (j == columns)))
+
+        self.__invalid_matrix[i, j] = block_adjacency_count >= required_count
+
+    # The blocks changing color with the new threshold count are the ones with a count in between the old threshold
+    # count and the new one. Since the counts are sorted, two binary searches find all of them.
+    def __update_threshold(self, threshold: float) -> None:
+        low, high = sorted((self.__validity_threshold_count, threshold))
+        first = np.searchsorted(self.__sorted_counts, low, side="right")
+        last = np.searchsorted(self.__sorted_counts, high, side="right")
+
+        self.__validity_threshold_count = threshold
+        self.__changed_cells = np.column_stack(np.unravel_index(self.__count_order[first:last],
+                                                                self.__block_counts.shape))
+
+        if len(self.__changed_cells) > 0:
+            self.__update_cells(self.__changed_cells)
+
+    # Updates the color of the given blocks, as an array of (row, column), then the points and moves around them
+    def __update_cells(self, cells: np.ndarray) -> None:
+        # The matrices may be read only memory maps from the cache, they're copied before the first change
+        if not self.__invalid_matrix.flags.writeable:
+            self.__blocked_matrix = np.array(self.__blocked_matrix)
+            self.__invalid_matrix = np.array(self.__invalid_matrix)
+
+        rows, columns = cells[:, 0], cells[:, 1]
+        self.__blocked_matrix[rows + 1, columns + 1] = self.__block_counts[rows, columns] \
+            > self.__validity_threshold_count
+
+        # The validity of a point depends on its 4 surrounding blocks, so only the corners of the blocks change
+        height, width = self.__invalid_matrix.shape
+        self.__set_invalid_points_at(points_around_blocks(cells, width, height))
+
+        # The moves of a point depend on its surrounding blocks and on the validity of its neighbours, so they can
+        # change for the points up to one step further away than the corners. Only those are worked out again,
+        # unless they're so many that it's faster to work out the whole map.
+        point_ids = points_around_blocks(cells, width, height, reach=1)
+
+        if len(point_ids) > FULL_UPDATE_FRACTION * self.__invalid_matrix.size:
+            self.__move_table.rebuild(self.blocked_matrix, self.__invalid_matrix)
+        else:
+            self.__move_table.update(self.blocked_matrix, self.__invalid_matrix, point_ids)
+
+    # Tells if the coordinates are one of the invalid points of the map
+    def is_invalid_coordinate(self, coords: tuple) -> bool:
+        point = self.to_lattice(coords)
+        return point is not None and self.is_invalid_point(point)
+
+    # Tells if the lattice point (i, j) is invalid, i being the index of the x grid line and j the one of the y
+    def is_invalid_point(self, point: tuple) -> bool:
+        return bool(self.__invalid_matrix[point[1], point[0]])
+
+    # Counts the yellow blocks that have both lattice points as corners, which is 2 at most for neighbouring points.
+    # A vertical or horizontal move between the points goes along these blocks, a diagonal one crosses the block.
+    def count_blocked_blocks(self, source: tuple, target: tuple) -> int:
+        # The blocks around the point (i, j) are in the rows j and j + 1 and the columns i and i + 1 of the padded
+        # matrix, so the shared blocks are in the intersection of those ranges
+        return int(self.__blocked_matrix[max(source[1], target[1]):min(source[1], target[1]) + 2,
+                                         max(source[0], target[0]):min(source[0], target[0]) + 2].sum())
+
+    # Returns the lattice point (i, j) at the given coordinates, or None if they aren't a point of the map.
+    # The rounding makes up for the floating point errors of adding the grid size to a coordinate.
+    def to_lattice(self, coords: tuple):
+        i = int(round((coords[0] - self.__x_lattice[0]) / self.__grid_size))
+        j = int(round((coords[1] - self.__y_lattice[0]) / self.__grid_size))
+
+        if 0 <= i < len(self.__x_lattice) and 0 <= j < len(self.__y_lattice) \
+                and abs(coords[0] - self.__x_lattice[i]) <= self.__grid_size * 1e-6 \
+                and abs(coords[1] - self.__y_lattice[j]) <= self.__grid_size * 1e-6:
+            return i, j
+
+        return None
+
+    # Snaps the points, an array of (x, y) rows, to lattice points of the map and returns them as an array of (i, j)
+    # rows. The mode tells what the x and y are:
+    #   "coordinates"  map coordinates, snapped to the grid lines at or below them, or to the closest edges of the map
+    #                  when they're outside of it
+    #   "index"        indices of the grid lines, negative ones counting from the end like list indices.
+    #                  ValueError is raised if one of them isn't a grid line.
+    #   "auto"         map coordinates when they're inside the map, indices otherwise when they can be, like the
+    #                  coordinates asked to the user. x and y are told apart separately.
+    def snap(self, points, mode: str = "coordinates") -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        if mode not in ("coordinates", "index", "auto"):
+            raise ValueError("Unknown snapping mode %r." % mode)
+
+        return np.column_stack([self.__snap_axis(points[:, 0], self.__x_lattice, mode),
+                                self.__snap_axis(points[:, 1], self.__y_lattice, mode)])
+
+    def __snap_axis(self, values: np.ndarray, lattice: np.ndarray, mode: str) -> np.ndarray:
+        # The values a bit under a grid line because of floating point errors are still on it, like in to_lattice()
+        from_coordinates = np.searchsorted(lattice, values + self.__grid_size * 1e-6, side="right") - 1
+        from_coordinates = np.clip(from_coordinates, 0, len(lattice) - 1)
+
+        if mode == "coordinates":
+            return from_coordinates
+
+        indices = np.trunc(values)
+        is_index = (-len(lattice) <= indices) & (indices < len(lattice))
+
+        if mode == "index":
+            if not is_index.all():
+                raise ValueError("There are indices outside of the %d grid lines." % len(lattice))
+
+            return indices.astype(np.int64) % len(lattice)
+
+        inside = (lattice[0] <= values) & (values <= lattice[-1])
+        from_indices = np.where(is_index, indices, 0).astype(np.int64) % len(lattice)
+
+        return np.where(is_index & ~inside, from_indices, from_coordinates)
+
+    # Returns the map coordinates (x, y) of the lattice point (i, j)
+    def to_coordinates(self, point: tuple) -> tuple:
+        return float(self.__x_lattice[point[0]]), float(self.__y_lattice[point[1]])
+
+    # Counts the points once for the base grid size, every grid size that is a multiple of it is then derived from
+    # these counts instead of counting the points again
+    def build_pyramid(self, base_grid_size: float) -> None:
+        self.__pyramid = GridPyramid(self.__crime_points, self.__area_coordinates, base_grid_size)
+
+    # The cache entries of the map are for the content of the shapefile and the grid size, plus the given parameters
+    def __cache_load(self, *parameters):
+        if self.__cache is None:
+            return None
+
+        return self.__cache.load((self.__dataset_key, float(self.__grid_size)) + parameters)
+
+    def __cache_store(self, arrays: dict, *parameters) -> None:
+        if self.__cache is not None:
+            self.__cache.store((self.__dataset_key, float(self.__grid_size)) + parameters, arrays)
 
     def windowed_graph(self, val: bool) -> None:
-        matplotlib.use("TkAgg" if val else "module://backend_interagg")
+        self.__backend = WINDOWED_BACKEND if val else PANEL_BACKEND
+
+    # The graphs are then only saved to files, see the file of show_block(), which works without a display
+    def headless_graph(self) -> None:
+        self.__backend = HEADLESS_BACKEND
 
     @property
     def grid_size(self) -> float:
@@ -201,52 +440,124 @@ class LocationGrid:
         self.__x_axis_ticks = np.arange(self.__area_coordinates[0], self.__area_coordinates[2], self.__grid_size)
         self.__y_axis_ticks = np.arange(self.__area_coordinates[1], self.__area_coordinates[3], self.__grid_size)
 
-        self.__block_graph_data = []
-        self.__block_graph_data_formatted = []
-
-        # Won't get much into the details here, it's kind of a mess. I created this at 3 AM, it shows my confusion.
-        # Either way, this populates block_graph_data with this [[x1, y1, x2, y2], crime_count].
-        # At index 0 there are block coordinates and at index 1 there's the crime count for that block.
-        # For every y coordinate in the graph, we iterate all x coordinates
-        for j in range(len(self.__y_axis_ticks)):
-            bottom_boundary = self.__y_axis_ticks[-j - 1]
-            top_boundary = self.__y_axis_ticks[-j] if j != 0 else bottom_boundary + self.__grid_size
-
-            # For all x coordinates we add a list entry to block_graph_data for a block and set its count to 0
-            for i, x_coord in enumerate(self.__x_axis_ticks):
-                left_boundary = x_coord
-                right_boundary = self.__x_axis_ticks[i + 1] if i != len(self.__x_axis_ticks) - 1 \
-                    else x_coord + self.__grid_size
-
-                self.__block_graph_data.append([])
-                self.__block_graph_data[(j * len(self.__x_axis_ticks)) + i] \
-                    .append([left_boundary, bottom_boundary, right_boundary, top_boundary])
-                self.__block_graph_data[(j * len(self.__x_axis_ticks)) + i] \
-                    .append(0)
-
-                # For every block, we iterate through all the crime coordinates we got and increment the block's crime
-                # count for ever crime coordinate falling within the block's coordinates excluding top-right
-                for point in self.__crime_df["Coordinates"]:
-                    if (left_boundary <= point[0] < right_boundary) and (bottom_boundary <= point[1] < top_boundary):
-                        self.__block_graph_data[(j * len(self.__x_axis_ticks)) + i][1] += 1
-
-        # This takes the block_graph_data we just gathered creates another list where only the crime counts are present.
-        # This is needed specifically for the imshow() function that will draw the block graph.
-        # The list will be composed of lists of the size of the axis ticks. Basically, there's an list for every row
-        # in the imshow() graph.
-        for i, element in enumerate(self.__block_graph_data):
-            if i % len(self.__x_axis_ticks) == 0:
-                self.__block_graph_data_formatted.append([])
-
-            self.__block_graph_data_formatted[math.floor(i / len(self.__x_axis_ticks))].append(element[1])
-
-        # This DataFrame is used to gather the statistics necessary
-        self.__block_df = pd.DataFrame(columns=["Blocks", "Crime Count"],
-                                       data=self.__block_graph_data)
-
-        self.__crime_count = self.__block_df["Crime Count"].sum()
-        self.__crime_mean = self.__block_df["Crime Count"].mean()
-        self.__crime_standard_deviation = self.__block_df["Crime Count"].std()
+        # The grid lines are the axis ticks plus the closing tick that isn't displayed in the graph
+        self.__x_lattice = np.append(self.__x_axis_ticks, self.__x_axis_ticks[-1] + self.__grid_size)
+        self.__y_lattice = np.append(self.__y_axis_ticks, self.__y_axis_ticks[-1] + self.__grid_size)
+
+        # Crime count of every block in a single pass over the points, row 0 being the bottom row of the map.
+        # They're added up from the pyramid when the grid size is a multiple of its base, or they may have already
+        # been counted for the same grid size in a previous run.
+        pyramid_counts = self.__pyramid.counts(grid_size) if self.__pyramid is not None else None
+        cached = self.__cache_load("counts") if pyramid_counts is None else None
+
+        if pyramid_counts is not None:
+            self.__block_counts = pyramid_counts
+        elif cached is not None:
+            self.__block_counts = cached["counts"]
+        else:
+            self.__block_counts = count_points_per_block(self.__crime_points, self.__x_lattice, self.__y_lattice)
+            self.__cache_store({"counts": self.__block_counts}, "counts")
+
+        # The counts are also kept sorted, with the flat index of the block each count came from
+        self.__count_order = np.argsort(self.__block_counts, axis=None, kind="stable")
+        self.__sorted_counts = self.__block_counts.ravel()[self.__count_order]
+
+        # The validity of the points has to be worked out from scratch for the new grid
+        self.__validity_threshold_count = None
+        self.__changed_cells = None
+
+        # The statistics of the counts are kept as the sum of the counts and the sum of their squares, so that they
+        # can be updated with the added points without going over every block again
+        counts = self.__block_counts.astype(np.int64)
+        self.__crime_count = int(counts.sum())
+        self.__count_square_sum = int((counts * counts).sum())
+        self.__set_count_statistics()
+
+    # The mean and the sample standard deviation of the block counts, like pandas' mean() and std()
+    def __set_count_statistics(self) -> None:
+        block_count = self.__block_counts.size
+        self.__crime_mean = self.__crime_count / block_count
+
+        if block_count > 1:
+            variance = (self.__count_square_sum - self.__crime_count * self.__crime_mean) / (block_count - 1)
+            self.__crime_standard_deviation = math.sqrt(max(variance, 0))
+        else:
+            self.__crime_standard_deviation = math.nan
+
+    # Adds new crimes to the map, as an array of (x, y) rows, eg: as they're reported. The points outside of the map
+    # are left out. The counts of their blocks and the statistics are updated in place, and when the validity was
+    # already worked out, the blocks that changed color with the new counts are updated like for a new threshold,
+    # along with the points and moves around them. The threshold count is worked out again from the new counts.
+    # Returns the (row, column) of the blocks that changed color, also kept as the changed_cells of the map.
+    def add_points(self, points) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x1, y1, x2, y2 = self.__area_coordinates
+        points = points[(x1 <= points[:, 0]) & (points[:, 0] <= x2) & (y1 <= points[:, 1]) & (points[:, 1] <= y2)]
+
+        if len(points) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        self.__append_points(points)
+
+        # The cache entries are for the content of the shapefile, which the map doesn't match anymore
+        self.__cache = None
+
+        rows, columns = block_indices(points, self.__x_lattice, self.__y_lattice)
+        counts = self.__block_counts
+
+        # The statistics only change by the blocks the points fell in, from their old count to their new one
+        touched = np.unique(rows * counts.shape[1] + columns)
+        old_counts = counts.ravel()[touched].astype(np.int64)
+
+        if self.__pyramid is not None:
+            self.__pyramid.add_points(points)
+
+        pyramid_counts = self.__pyramid.counts(self.__grid_size) if self.__pyramid is not None else None
+
+        if pyramid_counts is not None:
+            self.__block_counts = counts = pyramid_counts
+        else:
+            # The counts may be a read only memory map from the cache, they're copied before the first change
+            if not counts.flags.writeable:
+                self.__block_counts = counts = np.array(counts)
+
+            np.add.at(counts, (rows, columns), 1)
+
+        new_counts = counts.ravel()[touched].astype(np.int64)
+        self.__crime_count += int(new_counts.sum() - old_counts.sum())
+        self.__count_square_sum += int((new_counts * new_counts - old_counts * old_counts).sum())
+        self.__set_count_statistics()
+
+        self.__count_order = np.argsort(counts, axis=None, kind="stable")
+        self.__sorted_counts = counts.ravel()[self.__count_order]
+
+        if self.__validity_threshold_count is None:
+            return np.empty((0, 2), dtype=np.int64)
+
+        # Both the counts and the threshold count moved, so every block is compared to the new threshold count
+        threshold = self.threshold_count
+        self.__validity_threshold_count = threshold
+        self.__changed_cells = np.argwhere((counts > threshold) != self.blocked_matrix)
+
+        if len(self.__changed_cells) > 0:
+            self.__update_cells(self.__changed_cells)
+
+        return self.__changed_cells
+
+    # Appends the points to the buffer, which doubles in size when it's full so that appending stays cheap
+    def __append_points(self, points: np.ndarray) -> None:
+        point_count = len(self.__crime_points)
+        new_count = point_count + len(points)
+
+        if new_count > len(self.__point_buffer) or self.__point_buffer is self.__crime_points:
+            buffer = np.empty((max(new_count, 2 * point_count), 2), dtype=np.float64)
+            buffer[:point_count] = self.__crime_points
+            self.__point_buffer = buffer
+
+        self.__point_buffer[point_count:new_count] = points
+        self.__crime_points = self.__point_buffer[:new_count]
+        self.__points_x = self.__crime_points[:, 0]
+        self.__points_y = self.__crime_points[:, 1]
 
     @property
     def threshold(self) -> float:
@@ -256,13 +567,63 @@ class LocationGrid:
     def threshold(self, threshold: float) -> None:
         self.__threshold = threshold if 0 <= threshold <= 1 else 0.5
 
+    # The crime count at the threshold percentile of the blocks eg: 0.5 returns the median, interpolated linearly
+    # in between two blocks like pandas' quantile(). Blocks with a count above it are yellow.
+    @property
+    def threshold_count(self) -> float:
+        position = self.__threshold * (len(self.__sorted_counts) - 1)
+        lower = int(math.floor(position))
+        upper = min(lower + 1, len(self.__sorted_counts) - 1)
+        fraction = position - lower
+
+        below = float(self.__sorted_counts[lower])
+        above = float(self.__sorted_counts[upper])
+
+        # This is computed from the closest count, the same way numpy does
+        if fraction >= 0.5:
+            return above - (above - below) * (1 - fraction)
+        return below + (above - below) * fraction
+
+    # The (row, column) of the blocks that changed color the last time set_coordinates_validity() was called with
+    # a different threshold or points were added, or None when everything was worked out from scratch
+    @property
+    def changed_cells(self) -> np.ndarray:
+        return self.__changed_cells
+
+    # The coordinates [x1, y1, x2, y2] of every yellow block, from the top row to the bottom one
     @property
     def blocked_blocks(self) -> list:
-        return self.__blocked_blocks
+        x_edges = self.__x_lattice.tolist()
+        y_edges = self.__y_lattice.tolist()
+        rows = len(y_edges) - 1
+
+        top_down_rows, columns = np.nonzero(self.blocked_matrix[::-1])
+        return [[x_edges[j], y_edges[rows - i - 1], x_edges[j + 1], y_edges[rows - i]]
+                for i, j in zip(top_down_rows.tolist(), columns.tolist())]
 
+    # The coordinates (x, y) of every invalid point, from the bottom row to the top one
     @property
     def invalid_coordinates(self) -> list:
-        return self.__invalid_coordinates
+        x_coords = self.__x_lattice.tolist()
+        y_coords = self.__y_lattice.tolist()
+
+        rows, columns = np.nonzero(self.__invalid_matrix)
+        return [(x_coords[j], y_coords[i]) for i, j in zip(rows.tolist(), columns.tolist())]
+
+    # Crime count of every block indexed by (row, column), the bottom left block being (0, 0)
+    @property
+    def block_counts(self) -> np.ndarray:
+        return self.__block_counts
+
+    # Yellow blocks indexed by (row, column), the bottom left block being (0, 0)
+    @property
+    def blocked_matrix(self) -> np.ndarray:
+        return self.__blocked_matrix[1:-1, 1:-1]
+
+    # Invalid points indexed by (row, column), the bottom left point being (0, 0)
+    @property
+    def invalid_matrix(self) -> np.ndarray:
+        return self.__invalid_matrix
 
     @property
     def x_axis_ticks(self) -> np.ndarray:
@@ -272,6 +633,44 @@ class LocationGrid:
     def y_axis_ticks(self) -> np.ndarray:
         return self.__y_axis_ticks
 
+    # The valid moves of every point, available after set_coordinates_validity()
+    @property
+    def move_table(self) -> MoveTable:
+        return self.__move_table
+
+    # The pyramid of counts the grid sizes are derived from, None unless a base grid size was given
+    @property
+    def pyramid(self):
+        return self.__pyramid
+
+    # The x coordinates of the grid lines, which are the axis ticks plus the closing one
+    @property
+    def x_lattice(self) -> np.ndarray:
+        return self.__x_lattice
+
+    # The y coordinates of the grid lines, which are the axis ticks plus the closing one
+    @property
+    def y_lattice(self) -> np.ndarray:
+        return self.__y_lattice
+
+    # DataFrame with the information of every crime eg: date, type, etc. and its coordinates.
+    # It is read from the file the first time it is used, so the points added later aren't in it.
+    # pandas is only imported then, it takes a while to import and nothing else needs it.
+    @property
+    def crime_df(self) -> "pandas.DataFrame":
+        if self.__crime_df is None:
+            import pandas as pd
+
+            with shp.Reader(self.__shapefile, "r", encoding="ANSI") as sf:
+                # Fields are column name and records are information related to every crime
+                fields = [x[0] for x in sf.fields][1:]
+                records = [y[:] for y in sf.records()]
+
+            self.__crime_df = pd.DataFrame(columns=fields, data=records)
+            self.__crime_df = self.__crime_df.assign(Coordinates=self.__crime_points[:self.__record_count].tolist())
+
+        return self.__crime_df
+
     @property
     def crime_count(self) -> int:
         return self.__crime_count
@@ -287,3 +686,9 @@ class LocationGrid:
     # The heuristic search will give this object a list of nodes that represent the shortest path
     def update_path_data(self, path: list):
         self.__search_path_data = path
+
+    # The ids of the points a search expanded, like the explored of its SearchStats, to be drawn in the block graph.
+    # An empty list stops drawing them.
+    def update_explored_data(self, explored: list):
+        self.__explored_data = explored
+
@@ -0,0 +1,249 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import numpy as np
+
+# The 8 directions a move can take as lattice steps (di, dj), clockwise from the top:
+# Top, Top-Right, Right, Bottom-Right, Bottom, Bottom-Left, Left and Top-Left.
+# The direction k of a point is valid when the bit k of its move mask is set.
+DIRECTIONS = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+
+STRAIGHT_COST = 1
+BLOCK_EDGE_COST = 1.3
+DIAGONAL_COST = 1.5
+
+
+# This holds every valid move of the map, so the search doesn't have to work them out on every expansion.
+# Points are given a flat id, j * width + i, which is also their index in the raveled matrices.
+# When lazy, the neighbour lists are never built, the moves of a point are read from its mask and costs every time it's
+# expanded. It's for tables that mustn't be copied, eg: the ones the worker processes map from shared memory.
+class MoveTable:
+    def __init__(self, masks: np.ndarray, costs: np.ndarray, lazy: bool = False):
+        self.__masks = masks  # uint8 matrix (height, width), bit k is set when the direction k is a valid move
+        self.__costs = costs  # float matrix (height, width, 8), the cost of each move, inf when it's not valid
+        self.__height, self.__width = masks.shape
+        self.__lazy = lazy
+        self.__neighbours = None
+        self.__version = 0  # Goes up on every update, so what was derived from the table knows when it's outdated
+
+        # The difference between the id of a point and the one of its neighbour in every direction
+        self.__offsets = [dj * self.__width + di for di, dj in DIRECTIONS]
+
+    # Every valid move from the point with the given id, as a list of (neighbour id, move cost)
+    def neighbours(self, point_id: int) -> list:
+        if self.__lazy:
+            return self.__point_neighbours(point_id)
+
+        # The lists are only built the first time a search needs them, then they're kept for all the other searches
+        if self.__neighbours is None:
+            self.__neighbours = self.__build_neighbours()
+
+        return self.__neighbours[point_id]
+
+    # Every lattice point the point (i, j) can move to
+    def moves(self, point: tuple) -> list:
+        mask = int(self.__masks[point[1], point[0]])
+        return [(point[0] + di, point[1] + dj) for k, (di, dj) in enumerate(DIRECTIONS) if mask >> k & 1]
+
+    # The cost of the move between two neighbouring lattice points
+    def cost(self, source: tuple, target: tuple) -> float:
+        k = DIRECTIONS.index((target[0] - source[0], target[1] - source[1]))
+        return float(self.__costs[source[1], source[0], k])
+
+    # Works out the moves of the points with the given ids again, after some blocks or points around them changed
+    def update(self, blocked_matrix: np.ndarray, invalid_matrix: np.ndarray, point_ids: np.ndarray) -> None:
+        # The matrices may be read only memory maps from the cache, they're copied before the first change
+        if not self.__masks.flags.writeable:
+            self.__masks = np.array(self.__masks)
+            self.__costs = np.array(self.__costs)
+
+        j, i = np.divmod(point_ids, self.__width)
+        masks, costs = compute_point_moves(blocked_matrix, invalid_matrix, j, i)
+        self.__version += 1
+
+        # Only the points whose moves actually changed are updated
+        all_masks = self.__masks.reshape(-1)
+        all_costs = self.__costs.reshape(-1, len(DIRECTIONS))
+        changed = (masks != all_masks[point_ids]) | np.any(costs != all_costs[point_ids], axis=1)
+        all_masks[point_ids] = masks
+        all_costs[point_ids] = costs
+
+        # The neighbour lists of these points are built again if they were built already
+        if self.__neighbours is not None:
+            self.__fill_neighbours(self.__neighbours, point_ids[changed])
+
+    # Works out the moves of every point again, for changes spread over so much of the map that it's faster than
+    # updating the points one by one. The neighbour lists are built again on the next search.
+    def rebuild(self, blocked_matrix: np.ndarray, invalid_matrix: np.ndarray) -> None:
+        self.__masks, self.__costs = compute_moves(blocked_matrix, invalid_matrix, 0, self.__height, 0, self.__width)
+        self.__neighbours = None
+        self.__version += 1
+
+    def point_id(self, point: tuple) -> int:
+        return point[1] * self.__width + point[0]
+
+    def point(self, point_id: int) -> tuple:
+        j, i = divmod(point_id, self.__width)
+        return i, j
+
+    # The neighbour list of a single point, read from its mask and costs
+    def __point_neighbours(self, point_id: int) -> list:
+        j, i = divmod(point_id, self.__width)
+        mask = int(self.__masks[j, i])
+        costs = self.__costs[j, i].tolist()
+        return [(point_id + offset, costs[k]) for k, offset in enumerate(self.__offsets) if mask >> k & 1]
+
+    def __build_neighbours(self) -> list:
+        neighbours = [None] * self.__masks.size
+        self.__fill_neighbours(neighbours, np.arange(self.__masks.size))
+        return neighbours
+
+    # Builds the neighbour lists of the points with the given ids, a direction at a time for all of them
+    def __fill_neighbours(self, neighbours: list, point_ids: np.ndarray) -> None:
+        masks = self.__masks.reshape(-1)[point_ids]
+        costs = self.__costs.reshape(-1, len(DIRECTIONS))[point_ids]
+
+        for point_id in point_ids.tolist():
+            neighbours[point_id] = []
+
+        # The directions are added in order, so the neighbours come in the same order as the moves
+        for k, (di, dj) in enumerate(DIRECTIONS):
+            moving = np.flatnonzero(masks & (1 << k))
+            sources = point_ids[moving]
+            targets = sources + dj * self.__width + di
+
+            for source, target, cost in zip(sources.tolist(), targets.tolist(), costs[moving, k].tolist()):
+                neighbours[source].append((target, cost))
+
+    @property
+    def masks(self) -> np.ndarray:
+        return self.__masks
+
+    @property
+    def costs(self) -> np.ndarray:
+        return self.__costs
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def width(self) -> int:
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        return self.__height
+
+
+# Works out the valid moves and their costs for every point of the map at once.
+# blocked_matrix tells which blocks are yellow and invalid_matrix which points are invalid, both by (row, column).
+def build_move_table(blocked_matrix: np.ndarray, invalid_matrix: np.ndarray) -> MoveTable:
+    height, width = invalid_matrix.shape
+    return MoveTable(*compute_moves(blocked_matrix, invalid_matrix, 0, height, 0, width))
+
+
+# Works out the move masks and costs of the points in the rows [j1, j2) and the columns [i1, i2) of the map.
+def compute_moves(blocked_matrix: np.ndarray, invalid_matrix: np.ndarray, j1: int, j2: int, i1: int, i2: int) -> tuple:
+    # The blocks surrounding the points of the window, the blocks outside the map are blue
+    blocked = _window(blocked_matrix, j1 - 1, j2, i1 - 1, i2, False)
+
+    # The points of the window and their neighbours, the points outside the map are treated as invalid so that no
+    # move leaves the map
+    invalid = _window(invalid_matrix, j1 - 1, j2 + 1, i1 - 1, i2 + 1, True)
+
+    # The four blocks surrounding every point are (south west, south east, north west, north east)
+    return _moves((blocked[:-1, :-1], blocked[:-1, 1:], blocked[1:, :-1], blocked[1:, 1:]),
+                  lambda di, dj: invalid[1 + dj:1 + dj + j2 - j1, 1 + di:1 + di + i2 - i1],
+                  np.arange(i1, i2)[np.newaxis, :], np.arange(j1, j2)[:, np.newaxis], invalid_matrix.shape)
+
+
+# Works out the move masks and costs of the points (i[n], j[n]) of the map, as arrays of n masks and (n, 8) costs.
+# Only the blocks and points around them are looked at, so it's for points spread over the map.
+def compute_point_moves(blocked_matrix: np.ndarray, invalid_matrix: np.ndarray, j: np.ndarray, i: np.ndarray) -> tuple:
+    # The point (i, j) is surrounded by the blocks (j - 1, i - 1) to (j, i), and its neighbours are the points
+    # (i + di, j + dj). The blocks outside the map are blue and the points outside it are invalid.
+    return _moves((_gather(blocked_matrix, j - 1, i - 1, False), _gather(blocked_matrix, j - 1, i, False),
+                   _gather(blocked_matrix, j, i - 1, False), _gather(blocked_matrix, j, i, False)),
+                  lambda di, dj: _gather(invalid_matrix, j + dj, i + di, True), i, j, invalid_matrix.shape)
+
+
+# The ids of the lattice points around the blocks, given as an array of (row, column), with their 4 corners when reach
+# is 0, and the points up to reach steps further away otherwise
+def points_around_blocks(cells: np.ndarray, width: int, height: int, reach: int = 0) -> np.ndarray:
+    steps = np.arange(-reach, 2 + reach)
+    i, j = np.broadcast_arrays(cells[:, 1, None, None] + steps[None, None, :],
+                               cells[:, 0, None, None] + steps[None, :, None])
+    inside = (i >= 0) & (i < width) & (j >= 0) & (j < height)
+
+    # The points around neighbouring blocks are the same, each one is only kept once. The ids are sorted and the
+    # repeated ones dropped, like np.unique() does, which the newer NumPy versions make much slower with a hash table.
+    point_ids = np.sort(j[inside] * width + i[inside])
+    return point_ids[np.concatenate(([True], point_ids[1:] != point_ids[:-1]))]
+
+
+# The masks and costs of the points (i, j) from their four surrounding blocks and the validity of their neighbour in
+# every direction (di, dj), given by invalid_neighbours(di, dj). The shape of the points is the one of i and j
+# broadcast together.
+def _moves(surrounding_blocks: tuple, invalid_neighbours, i: np.ndarray, j: np.ndarray, shape: tuple) -> tuple:
+    height, width = shape
+    south_west, south_east, north_west, north_east = surrounding_blocks
+
+    # The yellow blocks along each vertical or horizontal move, and the one crossed by each diagonal move
+    along = {(0, 1): (north_west, north_east), (1, 0): (north_east, south_east),
+             (0, -1): (south_west, south_east), (-1, 0): (north_west, south_west)}
+    crossed = {(1, 1): north_east, (1, -1): south_east, (-1, -1): south_west, (-1, 1): north_west}
+
+    points_shape = np.broadcast(i, j).shape
+    on_x_edge = (i == 0) | (i == width - 1)
+    on_y_edge = (j == 0) | (j == height - 1)
+    interior = ~on_x_edge & ~on_y_edge
+    corner = on_x_edge & on_y_edge
+
+    masks = np.zeros(points_shape, dtype=np.uint8)
+    costs = np.full(points_shape + (len(DIRECTIONS),), np.inf)
+
+    for k, (di, dj) in enumerate(DIRECTIONS):
+        # The target point has to be valid
+        valid = ~invalid_neighbours(di, dj)
+
+        # From the boundary edges, only the moves going inside the map are possible, so none go along the edges
+        # and corners have a single diagonal move
+        valid &= ((i != 0) | (di == 1)) & ((i != width - 1) | (di == -1))
+        valid &= ((j != 0) | (dj == 1)) & ((j != height - 1) | (dj == -1))
+
+        if di != 0 and dj != 0:
+            # A diagonal move can't cross a yellow block. From the corners it is never checked, because a corner
+            # in a yellow block is an invalid point.
+            valid &= ~crossed[(di, dj)] | corner
+            cost = np.full(valid.shape, DIAGONAL_COST)
+        else:
+            # A vertical or horizontal move can't go in between two yellow blocks. It isn't checked from the
+            # edges, because an edge point in between two yellow blocks is an invalid point.
+            first, second = along[(di, dj)]
+            valid &= ~(first & second) | ~interior
+            # Going along a yellow block costs more
+            cost = np.where(first | second, BLOCK_EDGE_COST, STRAIGHT_COST)
+
+        masks |= valid.astype(np.uint8) << k
+        costs[..., k] = np.where(valid, cost, np.inf)
+
+    return masks, costs
+
+
+# Returns the rows [r1, r2) and columns [c1, c2) of the matrix, the cells outside the matrix are set to fill
+def _window(matrix: np.ndarray, r1: int, r2: int, c1: int, c2: int, fill: bool) -> np.ndarray:
+    window = np.full((r2 - r1, c2 - c1), fill, dtype=matrix.dtype)
+    rows, columns = matrix.shape
+    window[max(-r1, 0):rows - r1, max(-c1, 0):columns - c1] = matrix[max(r1, 0):r2, max(c1, 0):c2]
+    return window
+
+
+# The values of the matrix at the rows and columns, the ones outside the matrix are set to fill
+def _gather(matrix: np.ndarray, rows: np.ndarray, columns: np.ndarray, fill: bool) -> np.ndarray:
+    inside = (rows >= 0) & (rows < matrix.shape[0]) & (columns >= 0) & (columns < matrix.shape[1])
+    values = np.full(rows.shape, fill, dtype=matrix.dtype)
+    values[inside] = matrix[rows[inside], columns[inside]]
+    return values
@@ -3,25 +3,43 @@
 # Written by Mahdi Chaari - 27219946
 # For COMP 472 Section ABKX – Summer 2020
 # --------------------------------------------------------
+import heapq
 import math
-import queue as Q
 import time
+import weakref
 
+import numpy as np
+
+from classes.heuristics import make_heuristic
 from classes.location_grid import LocationGrid
+from classes.move_table import MoveTable
+from classes.search_stats import SearchStats
+
+# The arrays the searches keep their state in, by move table. They're as big as the map, so they're allocated once
+# and lent to every search, see _borrow_arrays(). A graph searched in place of a move table, like the ones of the
+# hierarchical search made for every query, has a move_table attribute with the move table it's a part of, and its
+# searches borrow the arrays of that move table.
+_search_arrays = weakref.WeakKeyDictionary()
 
 
-# This is the node we'll use to represent a valid coordinate on the map
+# This is the node we'll use to represent a valid point on the map.
+# The search works with lattice points (i, j), the indices of the x and y grid lines, which are exact unlike the
+# coordinates. The map coordinates are only given to the nodes of the path that is returned.
+# The searches keep their state in arrays, nodes are only made for the points of the path they found.
 class Node:
-    def __init__(self, previous, coordinates: tuple):
+    __slots__ = ("previous", "point", "coordinates", "f", "g", "h")
+
+    def __init__(self, previous, point: tuple):
         self.previous = previous  # This is to create a path history, like a linked list
-        self.coordinates = coordinates
+        self.point = point
+        self.coordinates = None
         self.f = 0
         self.g = 0
         self.h = 0
 
     # This is a like a toString() function
     def __repr__(self) -> str:
-        return str(self.coordinates)
+        return str(self.coordinates if self.coordinates is not None else self.point)
 
     # Comparison function
     def __lt__(self, other) -> bool:
@@ -29,15 +47,18 @@ class Node:
 
     # Equality function
     def __eq__(self, other) -> bool:
-        return self.coordinates == other.coordinates
-
-
-# This is the heuristic search function, it requires the map, and coordinates
-def informed_search(graph: LocationGrid, start_coords: tuple, end_coords: tuple) -> list:
-    # A priority queue is more practical than alist
-    open_list = Q.PriorityQueue()
-    closed_list = []
-
+        return self.point == other.point
+
+
+# This is the heuristic search function, it requires the map, and coordinates.
+# heuristic is the name of a heuristic of the registry or a heuristic function, see make_heuristic(), and weight
+# trades the cost of the path for a faster search.
+# search can replace the A* search over the whole map, it takes the start and end point ids and returns the ids of
+# the points of the path, its cost and the number of expanded points like a_star() does.
+# When stats are given, the A* search fills them in, see SearchStats. exact is False for a search that may not find
+# the shortest path, its cost is then told as approximate.
+def informed_search(graph: LocationGrid, start_coords: tuple, end_coords: tuple, search=None,
+                    heuristic="octile", weight: float = 1.0, stats: SearchStats = None, exact: bool = True) -> list:
     # Somewhat of a validation of the passed coordinates
     start_coords = check_coordinates_validity(start_coords, graph)
     end_coords = check_coordinates_validity(end_coords, graph)
@@ -46,440 +67,319 @@ def informed_search(graph: LocationGrid, start_coords: tuple, end_coords: tuple)
     print("\nUsing starting coordinates: " + str(start_coords))
     print("\nUsing end coordinates: " + str(end_coords))
 
-    if start_coords in graph.invalid_coordinates or end_coords in graph.invalid_coordinates:
+    start_point = graph.to_lattice(start_coords)
+    end_point = graph.to_lattice(end_coords)
+
+    if graph.is_invalid_point(start_point) or graph.is_invalid_point(end_point):
         print("\nDue to blocks, no path was found. Please change the points and try again.")
         return []
 
-    initial_node = Node(None, start_coords)
-    final_node = Node(None, end_coords)
-    current_node: Node
-    path = []
+    move_table = graph.move_table
 
-    search_time = time.time()
+    if search is None:
+        def search(start_id: int, end_id: int) -> tuple:
+            return a_star(move_table, start_id, end_id, make_heuristic(heuristic, move_table, end_id, weight),
+                          time_limit=10, stats=stats)
 
-    open_list.put_nowait(initial_node)
+    try:
+        path, cost, _ = search(move_table.point_id(start_point), move_table.point_id(end_point))
+    except TimeoutError:
+        print("\nTime is up. The optimal path was not found.")
+        return []
 
-    # This is the search loop
-    while open_list.qsize() > 0:
-        current_node = open_list.get_nowait()
+    if not path:
+        # The open list emptied and we haven't found a path
+        print("\nDue to blocks, no path was found. Please change the points and try again.")
+        return []
+
+    # The cost of the final node is the actual total cost
+    # A weight above 1 also trades the shortest path for a faster search
+    if exact and weight <= 1:
+        print("\nThe cost of the shortest path: " + str(cost))
+    else:
+        print("\nThe cost of the path found (approximate, it may not be the shortest): " + str(cost))
+
+    return build_path(graph, path)
+
+
+# This is the A* search between two points of the move table, given by their ids.
+# The heuristic takes a point id and returns the estimated cost from that point to the end point.
+# Returns the ids of the points of the path from start to end, its cost and the number of expanded points.
+# The path is empty and the cost None when there's no path, and TimeoutError is raised past the time limit.
+# When stats are given, they're filled in with what the search did.
+def a_star(move_table: MoveTable, start_id: int, end_id: int, heuristic, time_limit: float = None,
+           stats: SearchStats = None) -> tuple:
+    neighbours, push, pop = move_table.neighbours, heapq.heappush, heapq.heappop
+
+    # The search goes through the timed versions of these when there are stats to fill in
+    if stats is not None:
+        neighbours, heuristic = stats.timed_neighbours(neighbours), stats.timed_heuristic(heuristic)
+        push, pop = stats.push, stats.pop
+
+    # The open list is a binary heap of (f, g, point id). The lowest cost found so far to get to every point, where
+    # it came from and whether it was expanded already are kept in arrays by point id.
+    open_list = []
+    push(open_list, (heuristic(start_id), 0, start_id))
+    arrays = _borrow_arrays(move_table)
+    best_g, previous, closed_list = (memoryview(array) for array in arrays)
+    best_g[start_id] = 0
+    expanded = 0
 
-        # We put the node we just got from the open list in the closed list to remember we visited it already
-        closed_list.append(current_node)
+    search_time = time.time()
+    start_time = time.perf_counter()
+
+    try:
+        # This is the search loop
+        while open_list:
+            _, g, current_id = pop(open_list)
 
-        # We test the node for goal condition
-        if current_node == final_node:
-            # The current node is the final node, so we get it's g as the actual total cost
-            print("\nThe cost of the shortest path: " + str(current_node.g))
+            # A point is pushed again every time a cheaper way to it is found, instead of looking for it in the open
+            # list. So once the point was expanded with its lowest cost, its other entries are simply skipped.
+            if closed_list[current_id]:
+                continue
 
-            # We append the goal node and all the nodes that came before it to the path
-            while current_node != initial_node:
-                path.append(current_node)
+            # We put the point we just got from the open list in the closed list to remember we visited it already
+            closed_list[current_id] = True
+            expanded += 1
 
-                current_node = current_node.previous
+            if stats is not None:
+                stats.expanded(current_id)
 
-            # The initial node was a condition to know when to stop the loop, we add it after
-            path.append(initial_node)
+            # We test the point for goal condition, then follow the previous points back to the start
+            if current_id == end_id:
+                path = _follow(previous, current_id, start_id)[::-1]
 
-            # Since we added the nodes to the path list from the final node to the initial node, we return the path in
-            # reverse order to make its order become from initial to final node
-            return path[::-1]
+                if stats is not None:
+                    stats.finished(path, g, expanded, start_time)
 
-        (x_coord, y_coord) = current_node.coordinates
+                return path, g, expanded
 
-        # Get a list of all possible directions to explore next
-        possible_moves = find_valid_moves(x_coord, y_coord, graph)
+            # Every valid move from the current point with its cost
+            for next_id, move_cost in neighbours(current_id):
+                # Check if it was visited before so we can ignore it if it was
+                if closed_list[next_id]:
+                    continue
 
-        # We create a node for every point we can explore next
-        for move in possible_moves:
-            next_node = Node(current_node, move)
+                next_g = g + move_cost
+                known_g = best_g[next_id]
 
-            move_cost = get_move_cost(current_node.coordinates, next_node.coordinates, graph)
+                # If the point is already in the open list, we add it only if its cost is lower
+                if next_g >= known_g:
+                    continue
 
-            # Check if it was visited before so we can ignore it if it was
-            if next_node not in closed_list:
-                # This basically calculates the flight distance between the next node and the final node (straight line)
-                next_node.h = math.hypot(next_node.coordinates[0] - final_node.coordinates[0],
-                                         next_node.coordinates[1] - final_node.coordinates[1])
-                next_node.g = current_node.g + move_cost
-                next_node.f = next_node.h + next_node.g
+                if stats is not None and known_g < math.inf:
+                    stats.duplicate_pushes += 1
 
-                # We loop the open list for duplicates if the open list isn't empty, otherwise we add the next
-                # node to the list directly
-                if open_list.qsize() > 0:
-                    exists = False
-                    for node in open_list.queue:
-                        if next_node == node:
-                            exists = True
+                best_g[next_id] = next_g
+                previous[next_id] = current_id
 
-                            # If the node is already in the open list, we add it only if its f is lower
-                            if next_node.f < node.f:
-                                open_list.put_nowait(next_node)
-                                break
+                push(open_list, (next_g + heuristic(next_id), next_g, next_id))
 
-                    # If its f isn't lower and is already in the list we ignore it
-                    if not exists:
-                        open_list.put_nowait(next_node)
-                else:
-                    open_list.put_nowait(next_node)
+            # We check for the run time to interrupt when necessary
+            if time_limit is not None and time.time() - search_time > time_limit:
+                raise TimeoutError("The optimal path was not found in %s seconds." % time_limit)
+    finally:
+        _return_arrays(move_table, arrays)
 
-        # We check for the run time to interrupt when necessary
-        if time.time() - search_time > 10:
-            print("\nTime is up. The optimal path was not found.")
-            return []
+    if stats is not None:
+        stats.finished([], None, expanded, start_time)
 
     # The open list emptied and we haven't found a path
-    print("\nDue to blocks, no path was found. Please change the points and try again.")
-    return []
+    return [], None, expanded
 
 
-# noinspection DuplicatedCode
-# This function takes a starting coordinate and return a list of all valid neighbouring coordinates
-def find_valid_moves(x_coord, y_coord, graph) -> list:
-    possible_moves = []
-
-    # If the starting coordinates are not on the boundary edges, we look in all 8 directions
-    # For every direction, we check if the point is not in the invalid_coordinates list
-    if x_coord != graph.x_axis_ticks[0] and x_coord != graph.x_axis_ticks[-1] + graph.grid_size \
-            and y_coord != graph.y_axis_ticks[0] and y_coord != graph.y_axis_ticks[-1] + graph.grid_size:
-        # Top move
-        if (x_coord, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-            adjacent_blocks = 0
-
-            # If the source AND target points are adjacent to two different yellow blocks, the the move is illegal
-            # because that would mean it is crossing between two yellow blocks
-            # This rule applies to all vertical or horizontal moves
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and y_coord + graph.grid_size in block:
-                    adjacent_blocks += 1
-
-                    if adjacent_blocks >= 2:
-                        break
-
-            if adjacent_blocks < 2:
-                possible_moves.append((x_coord, y_coord + graph.grid_size))
-
-        # Top-Right move
-        if (x_coord + graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-            valid = True
-
-            # If the source AND target points are adjacent to the same yellow block, then the move is illegal
-            # A diagonal move is never adjacent to the same block unless it was crossed over
-            # This rule applies to all diagonal moves
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and x_coord + graph.grid_size in block \
-                        and y_coord + graph.grid_size in block:
-                    valid = False
-                    break
-
-            if valid:
-                possible_moves.append((x_coord + graph.grid_size, y_coord + graph.grid_size))
-
-        # Right move
-        if (x_coord + graph.grid_size, y_coord) not in graph.invalid_coordinates:
-            adjacent_blocks = 0
-
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and x_coord + graph.grid_size in block:
-                    adjacent_blocks += 1
-
-                    if adjacent_blocks >= 2:
-                        break
-
-            if adjacent_blocks < 2:
-                possible_moves.append((x_coord + graph.grid_size, y_coord))
-
-        # Bottom-Right move
-        if (x_coord + graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-            valid = True
-
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and x_coord + graph.grid_size in block \
-                        and y_coord - graph.grid_size in block:
-                    valid = False
-                    break
-
-            if valid:
-                possible_moves.append((x_coord + graph.grid_size, y_coord - graph.grid_size))
-
-        # Bottom move
-        if (x_coord, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-            adjacent_blocks = 0
-
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and y_coord - graph.grid_size in block:
-                    adjacent_blocks += 1
-
-                    if adjacent_blocks >= 2:
-                        break
-
-            if adjacent_blocks < 2:
-                possible_moves.append((x_coord, y_coord - graph.grid_size))
-
-        # Bottom-Left move
-        if (x_coord - graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-            valid = True
-
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and x_coord - graph.grid_size in block \
-                        and y_coord - graph.grid_size in block:
-                    valid = False
-                    break
-
-            if valid:
-                possible_moves.append((x_coord - graph.grid_size, y_coord - graph.grid_size))
-
-        # Left move
-        if (x_coord - graph.grid_size, y_coord) not in graph.invalid_coordinates:
-            adjacent_blocks = 0
-
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and x_coord - graph.grid_size in block:
-                    adjacent_blocks += 1
-
-                    if adjacent_blocks >= 2:
-                        break
-
-            if adjacent_blocks < 2:
-                possible_moves.append((x_coord - graph.grid_size, y_coord))
-
-        # Top-Left move
-        if (x_coord - graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-            valid = True
-
-            for block in graph.blocked_blocks:
-                if x_coord in block and y_coord in block and x_coord - graph.grid_size in block \
-                        and y_coord + graph.grid_size in block:
-                    valid = False
-                    break
-
-            if valid:
-                possible_moves.append((x_coord - graph.grid_size, y_coord + graph.grid_size))
-
-    # If the source coordinates are along the boundary edges, but not in corners
-    # We will check only at 3 direction depending on which side the point is on
-    elif (x_coord == graph.x_axis_ticks[0] or x_coord == graph.x_axis_ticks[-1] + graph.grid_size) \
-            != (y_coord == graph.y_axis_ticks[0] or y_coord == graph.y_axis_ticks[-1] + graph.grid_size):
-        # Bottom edge
-        if y_coord == graph.y_axis_ticks[0]:
-            # Top-Left move
-            if (x_coord - graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord - graph.grid_size in block \
-                            and y_coord + graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord - graph.grid_size, y_coord + graph.grid_size))
-            # Top move
-            # Here we do not check adjacency count because if the source point was adjacent to two yellow blocks,
-            # it would be in the invalid coordinates list
-            # This applies to vertical and horizontal movements from the edges of the map
-            if (x_coord, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord, y_coord + graph.grid_size))
-
-            # Top-Right move
-            if (x_coord + graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord + graph.grid_size in block \
-                            and y_coord + graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord + graph.grid_size, y_coord + graph.grid_size))
-
-        # Top boundary edge
-        elif y_coord == graph.y_axis_ticks[-1] + graph.grid_size:
-            # Bottom-Right move
-            if (x_coord + graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord + graph.grid_size in block \
-                            and y_coord - graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord + graph.grid_size, y_coord - graph.grid_size))
-
-            # Bottom move
-            if (x_coord, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord, y_coord - graph.grid_size))
-
-            # Bottom-Left move
-            if (x_coord - graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord - graph.grid_size in block \
-                            and y_coord - graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord - graph.grid_size, y_coord - graph.grid_size))
-
-        # Left boundary edge
-        elif x_coord == graph.x_axis_ticks[0]:
-            # Top-Right move
-            if (x_coord + graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord + graph.grid_size in block \
-                            and y_coord + graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord + graph.grid_size, y_coord + graph.grid_size))
-
-            # Right move
-            if (x_coord + graph.grid_size, y_coord) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord + graph.grid_size, y_coord))
-
-            # Bottom-Right move
-            if (x_coord + graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord + graph.grid_size in block \
-                            and y_coord - graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord + graph.grid_size, y_coord - graph.grid_size))
-
-        # Right boundary edge
-        else:
-            # Bottom-Left move
-            if (x_coord - graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord - graph.grid_size in block \
-                            and y_coord - graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord - graph.grid_size, y_coord - graph.grid_size))
-
-            # Left move
-            if (x_coord - graph.grid_size, y_coord) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord - graph.grid_size, y_coord))
-
-            # Top-Left move
-            if (x_coord - graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                valid = True
-
-                for block in graph.blocked_blocks:
-                    if x_coord in block and y_coord in block and x_coord - graph.grid_size in block \
-                            and y_coord + graph.grid_size in block:
-                        valid = False
-                        break
-
-                if valid:
-                    possible_moves.append((x_coord - graph.grid_size, y_coord + graph.grid_size))
-
-    # If the source coordinates are in one of the corners.
-    # Corners have only one movement option.
-    # We do need to check for adjacency because if they were adjacent to a single yellow block,
-    # they would be in the invalid coordinates list
-    else:
-        # Bottom-Left corner
-        if x_coord == graph.x_axis_ticks[0] and y_coord == graph.y_axis_ticks[0]:
-            # Top-Right move
-            if (x_coord + graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord + graph.grid_size, y_coord + graph.grid_size))
-
-        # Top-Left corner
-        elif x_coord == graph.x_axis_ticks[0] and y_coord == graph.y_axis_ticks[-1] + graph.grid_size:
-            # Bottom-Right move
-            if (x_coord + graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord + graph.grid_size, y_coord - graph.grid_size))
-
-        # Bottom-Right corner
-        elif x_coord == graph.x_axis_ticks[-1] + graph.grid_size and y_coord == graph.y_axis_ticks[0]:
-            # Top-Left move
-            if (x_coord - graph.grid_size, y_coord + graph.grid_size) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord - graph.grid_size, y_coord + graph.grid_size))
-
-        # Top-Right corner
-        elif x_coord == graph.x_axis_ticks[-1] + graph.grid_size \
-                and y_coord == graph.y_axis_ticks[-1] + graph.grid_size:
-            # Bottom-Left move
-            if (x_coord - graph.grid_size, y_coord - graph.grid_size) not in graph.invalid_coordinates:
-                possible_moves.append((x_coord - graph.grid_size, y_coord - graph.grid_size))
-
-    return possible_moves
-
-
-# Gets a source coordinates, target coordinates, and the map.
+# Lends the arrays of the state of a search to it: the lowest cost found to every point, inf when it wasn't reached,
+# the point it came from, and whether it was expanded. They're given back with _return_arrays() once the search is
+# done, so the next one doesn't have to allocate them again. A search running at the same time gets new ones.
+# The searches go through memoryviews of them, which read and write plain Python numbers, faster than numpy does.
+def _borrow_arrays(move_table: MoveTable) -> tuple:
+    lent = _search_arrays.setdefault(getattr(move_table, "move_table", move_table), [])
+
+    if lent:
+        return lent.pop()
+
+    size = move_table.width * move_table.height
+    return np.full(size, math.inf), np.full(size, -1, dtype=np.int64), np.zeros(size, dtype=bool)
+
+
+# Resets the arrays for the next search. The previous points are only read for the points that were reached, so
+# they don't have to be reset.
+def _return_arrays(move_table: MoveTable, arrays: tuple) -> None:
+    best_g, _, closed_list = arrays
+    best_g.fill(math.inf)
+    closed_list.fill(False)
+    _search_arrays.setdefault(getattr(move_table, "move_table", move_table), []).append(arrays)
+
+
+# The ids of the points from the point back to the last one, following the previous points of a search
+def _follow(previous: memoryview, point_id: int, last_id: int) -> list:
+    path = [point_id]
+
+    while point_id != last_id:
+        point_id = previous[point_id]
+        path.append(point_id)
+
+    return path
+
+
+# This is the bidirectional search mode of informed_search(), it gives the same list of nodes and path cost
+def bidirectional_search(graph: LocationGrid, start_coords: tuple, end_coords: tuple, heuristic="octile",
+                         stats: SearchStats = None) -> list:
+    move_table = graph.move_table
+
+    def search(start_id: int, end_id: int) -> tuple:
+        return bidirectional_a_star(move_table, start_id, end_id, heuristic, time_limit=10, stats=stats)
+
+    return informed_search(graph, start_coords, end_coords, search=search)
+
+
+# This is the A* search run from both points at once, one search going forward from the start point and the other
+# backward from the end point. The moves are the same both ways with the same costs, so both use the move table the
+# same way. heuristic is the name of a heuristic of the registry or a heuristic function, it's made for the end point
+# and for the start point.
+# Both searches are guided by the average of the two heuristics, with opposite signs, so they agree on the cost of
+# every path and can stop as soon as their two frontiers together can't lead to a cheaper path than the best found.
+# It returns the same as a_star(), with the expanded points of both searches, and fills in the stats when given.
+def bidirectional_a_star(move_table: MoveTable, start_id: int, end_id: int, heuristic="octile",
+                         time_limit: float = None, stats: SearchStats = None) -> tuple:
+    neighbours, push, pop = move_table.neighbours, heapq.heappush, heapq.heappop
+    to_end = make_heuristic(heuristic, move_table, end_id)
+    to_start = make_heuristic(heuristic, move_table, start_id)
+
+    if stats is not None:
+        neighbours, push, pop = stats.timed_neighbours(neighbours), stats.push, stats.pop
+        to_end, to_start = stats.timed_heuristic(to_end), stats.timed_heuristic(to_start)
+
+    def forward_potential(point_id: int) -> float:
+        return (to_end(point_id) - to_start(point_id)) / 2
+
+    def backward_potential(point_id: int) -> float:
+        return (to_start(point_id) - to_end(point_id)) / 2
+
+    # Everything is kept for both searches, the forward one at index 0 and the backward one at index 1.
+    # The open lists are binary heaps of (g + potential, g, point id).
+    potentials = (forward_potential, backward_potential)
+    open_lists = ([], [])
+    push(open_lists[0], (forward_potential(start_id), 0, start_id))
+    push(open_lists[1], (backward_potential(end_id), 0, end_id))
+    arrays = (_borrow_arrays(move_table), _borrow_arrays(move_table))
+    best_g, previous, closed_lists = ((memoryview(forward), memoryview(backward)) for forward, backward in zip(*arrays))
+    best_g[0][start_id] = 0
+    best_g[1][end_id] = 0
+    expanded = 0
+
+    # The cost of the best path found so far through a point reached by both searches, and that point
+    best_cost = 0 if start_id == end_id else math.inf
+    meeting_id = start_id if start_id == end_id else None
+
+    search_time = time.time()
+    start_time = time.perf_counter()
+
+    try:
+        while open_lists[0] and open_lists[1]:
+            # The potentials of both searches add up to 0, so the sum of the lowest keys of the open lists is a lower
+            # bound of the cost of any path that isn't found yet. Once it isn't lower than the best path, that path
+            # is the shortest one.
+            if open_lists[0][0][0] + open_lists[1][0][0] >= best_cost:
+                break
+
+            # The search with the smallest open list goes on, so neither of them grows much more than the other
+            side = 0 if len(open_lists[0]) <= len(open_lists[1]) else 1
+            other_side = 1 - side
+            _, g, current_id = pop(open_lists[side])
+
+            if closed_lists[side][current_id]:
+                continue
+
+            closed_lists[side][current_id] = True
+            expanded += 1
+
+            if stats is not None:
+                stats.expanded(current_id)
+
+            for next_id, move_cost in neighbours(current_id):
+                if closed_lists[side][next_id]:
+                    continue
+
+                next_g = g + move_cost
+
+                if next_g >= best_g[side][next_id]:
+                    continue
+
+                if stats is not None and best_g[side][next_id] < math.inf:
+                    stats.duplicate_pushes += 1
+
+                best_g[side][next_id] = next_g
+                previous[side][next_id] = current_id
+
+                push(open_lists[side], (next_g + potentials[side](next_id), next_g, next_id))
+
+                # The point was reached by the other search too when its cost there isn't inf, so there's a path
+                # through it
+                if next_g + best_g[other_side][next_id] < best_cost:
+                    best_cost = next_g + best_g[other_side][next_id]
+                    meeting_id = next_id
+
+            if time_limit is not None and time.time() - search_time > time_limit:
+                raise TimeoutError("The optimal path was not found in %s seconds." % time_limit)
+
+        if meeting_id is None:
+            if stats is not None:
+                stats.finished([], None, expanded, start_time)
+
+            return [], None, expanded
+
+        # The path goes from the start to the meeting point through the forward search, then to the end through the
+        # backward one
+        path = _follow(previous[0], meeting_id, start_id)[::-1] + _follow(previous[1], meeting_id, end_id)[1:]
+    finally:
+        for side_arrays in arrays:
+            _return_arrays(move_table, side_arrays)
+
+    if stats is not None:
+        stats.finished(path, best_cost, expanded, start_time)
+
+    return path, best_cost, expanded
+
+
+# Turns the ids of the points of a path into the list of nodes the map draws, linked from the end to the start.
+# Every node is given its map coordinates and the cost to get to it.
+def build_path(graph: LocationGrid, path: list) -> list:
+    move_table = graph.move_table
+    nodes = []
+    previous_node = None
+
+    for point_id in path:
+        node = Node(previous_node, move_table.point(point_id))
+        node.coordinates = graph.to_coordinates(node.point)
+
+        if previous_node is not None:
+            node.g = previous_node.g + move_table.cost(previous_node.point, node.point)
+        node.f = node.g
+
+        nodes.append(node)
+        previous_node = node
+
+    return nodes
+
+
+# This function takes a starting lattice point and return a list of all valid neighbouring lattice points.
+# The moves are worked out for the whole map by set_coordinates_validity(), see build_move_table() for the rules.
+def find_valid_moves(x: int, y: int, graph) -> list:
+    return graph.move_table.moves((x, y))
+
+
+# Gets a source lattice point, target lattice point, and the map.
 # Returns the cost of the move
 # Here we already know the move is valid
 def get_move_cost(source, target, graph) -> float:
-    # If the source and the target have the same x or the same y, the move is either vertical or horizontal
-    if source[0] == target[0] or source[1] == target[1]:
-        # We iterate through all the yellow blocks
-        for block in graph.blocked_blocks:
-            # If we find one that is adjacent to the source AND target point, then the move was along a yellow block
-            if source[0] in block and source[1] in block and target[0] in block and target[1] in block:
-                return 1.3
-        return 1
-    else:
-        return 1.5
+    return graph.move_table.cost(source, target)
 
 
 # noinspection DuplicatedCode
 # This is used to return adjusted coordinates from user input.
-# The assignment required that a coordinate inside one grid become the lowest coordinates in that grid
-def check_coordinates_validity(coords: tuple, graph) -> tuple:
-    x_coord = coords[0]
-    y_coord = coords[1]
-    # We change the axis here to include an additional tick that is not displayed din the graph
-    x_axis = list(graph.x_axis_ticks) + [graph.x_axis_ticks[-1] + graph.grid_size]
-    y_axis = list(graph.y_axis_ticks) + [graph.y_axis_ticks[-1] + graph.grid_size]
-
-    # The user can enter an index instead of a coordinate, but it has to be within positive or negative range
-    if -len(graph.x_axis_ticks) <= x_coord < len(x_axis):
-        x_coord = x_axis[int(x_coord)]
-
-    # If coordinate doesn't fall exactly within an axis tick
-    elif x_coord not in x_axis:
-        # Out of range coordinates are defaulted to maximum or minimum coordinate tick
-        if x_coord < x_axis[0]:
-            x_coord = x_axis[0]
-        elif x_coord > x_axis[-1]:
-            x_coord = x_axis[-1]
-        # We compare the coordinate with each tick until it is smaller than the tick, we then know that the lowest tick
-        # that coordinate can take precedes the higher ticker we just iterated to
-        else:
-            for i, tick in enumerate(x_axis):
-                if x_coord < tick:
-                    x_coord = x_axis[i - 1]
-                    break
-
-    # The same thing is done for the y coordinate
-    if -len(y_axis) <= y_coord < len(y_axis):
-        y_coord = y_axis[int(y_coord)]
-
-    elif y_coord not in y_axis:
-        if y_coord < y_axis[0]:
-            y_coord = y_axis[0]
-        elif y_coord > y_axis[-1]:
-            y_coord = y_axis[-1]
-        else:
-            for i, tick in enumerate(y_axis):
-                if y_coord < tick:
-                    y_coord = y_axis[i - 1]
-                    break
-
-    return x_coord, y_coord
+# The assignment required that a coordinate inside one grid become the lowest coordinates in that grid.
+# The coordinates are snapped to the map by LocationGrid.snap(), the mode tells if they're map coordinates, indices of
+# the grid lines, or either one like the ones the user enters, see its modes.
+def check_coordinates_validity(coords: tuple, graph, mode: str = "auto") -> tuple:
+    return graph.to_coordinates(graph.snap(coords, mode)[0].tolist())
@@ -0,0 +1,92 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from classes.location_grid import LocationGrid
+
+# The extensions of the files read as one JSON value per line, the others are read as CSV
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+# Reads the points appended to a file as they're written, eg: by the system the crimes are reported to, and yields
+# them in batches as arrays of (x, y) rows. A batch is yielded when it's full, or when the end of the file is reached
+# with points in it.
+# The file is CSV with the x and y as the first two values of a row, a header row being skipped, or NDJSON when its
+# extension is .ndjson or .jsonl, with either {"x": .., "y": ..} (or "longitude" and "latitude") or [x, y] on every
+# line. A line is only read once its newline was written. When follow is False, the reading stops at the end of
+# the file, otherwise the file is checked again every poll interval, and read from the start if it was truncated.
+def tail_points(path: str, batch_size: int = 1000, poll_interval: float = 1.0, follow: bool = True):
+    parse_line = _parse_ndjson_line if os.path.splitext(path)[1].lower() in NDJSON_EXTENSIONS else _parse_csv_line
+    batch = []
+
+    while True:
+        with open(path, newline="") as point_file:
+            partial_line = ""
+
+            while True:
+                line = point_file.readline()
+
+                if line.endswith("\n"):
+                    point = parse_line(partial_line + line)
+                    partial_line = ""
+
+                    if point is not None:
+                        batch.append(point)
+
+                    if len(batch) >= batch_size:
+                        yield np.array(batch, dtype=np.float64)
+                        batch = []
+
+                    continue
+
+                # The end of the file, the part of a line without its newline is kept until the rest is written
+                partial_line += line
+
+                if batch:
+                    yield np.array(batch, dtype=np.float64)
+                    batch = []
+
+                if not follow:
+                    return
+
+                time.sleep(poll_interval)
+
+                if os.path.getsize(path) < point_file.tell():
+                    break
+
+
+# Adds the points appended to the file to the map as they're written, see tail_points() for the file and the
+# arguments. Yields the (row, column) of the blocks that changed color with every batch, like add_points().
+def ingest(graph: LocationGrid, path: str, **kwargs):
+    for points in tail_points(path, **kwargs):
+        yield graph.add_points(points)
+
+
+# The (x, y) of a CSV row, or None for a header or a row without a point
+def _parse_csv_line(line: str):
+    row = next(csv.reader([line]), [])
+
+    try:
+        return float(row[0]), float(row[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _parse_ndjson_line(line: str):
+    try:
+        value = json.loads(line)
+
+        if isinstance(value, dict):
+            return float(value.get("x", value.get("longitude"))), float(value.get("y", value.get("latitude")))
+
+        return float(value[0]), float(value[1])
+    except (ValueError, TypeError, IndexError, KeyError):
+        return None
@@ -0,0 +1,368 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from classes.heuristics import make_heuristic
+from classes.location_grid import LocationGrid
+from classes.node import a_star, check_coordinates_validity
+from classes.shared_arrays import attach_move_table, share_move_table
+
+# The number of latest latencies the percentiles of every endpoint are worked out from
+LATENCY_WINDOW = 10000
+
+# The move tables of every map, by name, that each worker process searches in
+_worker_move_tables: dict
+_worker_memory: list
+
+
+# This answers route and block requests over HTTP for maps that are loaded once, when the server is made.
+# The maps are given by name, and their set_coordinates_validity() must have been called, see load_grid(). Their move
+# tables are copied once into shared memory, and the searches run in a pool of processes that all read them, so the
+# event loop only parses the requests and snaps the coordinates to the maps.
+# The routes of the same map asked for at about the same time are sent to the pool together, as batches of up to
+# batch_size routes gathered for at most batch_delay seconds, and at most max_concurrency batches of a map are
+# searched at once. The maps can't be changed while the server runs.
+#
+# The endpoints, which all answer JSON:
+#   GET  /grids                       the maps and their parameters
+#   GET  /blocks?grid=NAME[&x=X&y=Y]  the crime statistics of the map, or of the block with the coordinates
+#   POST /route                       {"grid", "start": [x, y], "end": [x, y], "heuristic", "weight", "path"}
+#   POST /routes                      {"grid", "routes": [[start_x, start_y, end_x, end_y], ...], ...}
+#   GET  /stats                       the number and latency percentiles of the requests, and the batches
+# Only grid, start and end are required, the coordinates are adjusted to the map like in informed_search(), "mode"
+# can be given to tell how, see LocationGrid.snap(). The cost of a route is None when no path was found, timed_out
+# tells apart the searches stopped by the time limit from the routes without a path.
+class RouteServer:
+    def __init__(self, grids: dict, processes: int = None, max_concurrency: int = 2, batch_size: int = 32,
+                 batch_delay: float = 0.002, time_limit: float = 10):
+        self.__grids = grids
+        self.__max_concurrency = max_concurrency
+        self.__batch_size = batch_size
+        self.__batch_delay = batch_delay
+        self.__time_limit = time_limit
+
+        self.__memory = []
+        tables = {}
+
+        for name, graph in grids.items():
+            memory, tables[name] = share_move_table(graph.move_table)
+            self.__memory += memory
+
+        self.__executor = ProcessPoolExecutor(processes, initializer=_attach_move_tables, initargs=(tables,))
+
+        # These are made with the event loop, see start()
+        self.__loop = None
+        self.__semaphores = {}
+
+        # The routes waiting to be sent to the pool, by map, heuristic and weight, and the timers sending them
+        self.__pending = {}
+        self.__flush_handles = {}
+        self.__batch_tasks = set()
+
+        self.__start_time = time.time()
+        self.__latencies = {}
+        self.__request_counts = {}
+        self.__error_counts = {}
+        self.__batch_stats = {name: {"batches": 0, "routes": 0, "in_flight": 0} for name in grids}
+
+    # Starts listening on the host and port, or on the Unix socket when a path is given
+    async def start(self, host: str = "127.0.0.1", port: int = 8080, unix_path: str = None) -> asyncio.AbstractServer:
+        self.__loop = asyncio.get_running_loop()
+        self.__semaphores = {name: asyncio.Semaphore(self.__max_concurrency) for name in self.__grids}
+
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.__handle_connection, unix_path)
+
+        return await asyncio.start_server(self.__handle_connection, host, port)
+
+    # Stops the worker processes and frees the shared memory, once the server is closed
+    def close(self) -> None:
+        self.__executor.shutdown()
+
+        for memory in self.__memory:
+            memory.close()
+            memory.unlink()
+
+        self.__memory = []
+
+    # Answers the requests of a connection, which is kept open between requests unless the client closes it
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line.strip():
+                    break
+
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if not line.strip():
+                        break
+
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, response = await self.__answer(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                content = json.dumps(response).encode()
+                writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+                             b"Connection: %s\r\n\r\n" % (status, b"OK" if status == 200 else b"Error", len(content),
+                                                          b"keep-alive" if keep_alive else b"close") + content)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # Returns the status and the JSON content of the answer to the request, and times it
+    async def __answer(self, method: str, target: str, body: bytes) -> tuple:
+        start_time = time.perf_counter()
+        url = urlsplit(target)
+        endpoints = {("GET", "/grids"): self.__get_grids, ("GET", "/blocks"): self.__get_blocks,
+                     ("POST", "/route"): self.__post_route, ("POST", "/routes"): self.__post_routes,
+                     ("GET", "/stats"): self.__get_stats}
+        endpoint = endpoints.get((method, url.path))
+
+        if endpoint is None:
+            return 404, {"error": "There's no %s %s." % (method, url.path)}
+
+        try:
+            if method == "GET":
+                parameters = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            else:
+                parameters = json.loads(body or b"{}")
+
+            status, response = 200, await endpoint(parameters)
+        except (KeyError, TypeError, ValueError, IndexError) as error:
+            status, response = 400, {"error": "Bad request: %r" % error}
+        except Exception as error:
+            # Anything else, eg: a broken process pool, still gets an answer instead of the connection being dropped
+            status, response = 500, {"error": "Internal error: %r" % error}
+
+        if status != 200:
+            self.__error_counts[url.path] = self.__error_counts.get(url.path, 0) + 1
+
+        self.__request_counts[url.path] = self.__request_counts.get(url.path, 0) + 1
+        self.__latencies.setdefault(url.path, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - start_time)
+
+        return status, response
+
+    async def __get_grids(self, parameters: dict) -> dict:
+        return {name: {"grid_size": graph.grid_size, "threshold": graph.threshold,
+                       "threshold_count": graph.threshold_count, "rows": graph.block_counts.shape[0],
+                       "columns": graph.block_counts.shape[1], "bbox": [float(graph.x_lattice[0]),
+                                                                        float(graph.y_lattice[0]),
+                                                                        float(graph.x_lattice[-1]),
+                                                                        float(graph.y_lattice[-1])]}
+                for name, graph in self.__grids.items()}
+
+    async def __get_blocks(self, parameters: dict) -> dict:
+        graph = self.__grids[parameters["grid"]]
+
+        if "x" not in parameters and "y" not in parameters:
+            return {"crime_count": int(graph.crime_count), "crime_mean": float(graph.crime_mean),
+                    "crime_standard_deviation": float(graph.crime_standard_deviation),
+                    "max_crime_count": int(graph.block_counts.max()), "threshold_count": graph.threshold_count,
+                    "blocked_count": int(graph.blocked_matrix.sum())}
+
+        # The block is the one the coordinates are in, the ones of the edges of the map are in its last blocks
+        rows, columns = graph.block_counts.shape
+        column = int(math.floor((float(parameters["x"]) - graph.x_lattice[0]) / graph.grid_size))
+        row = int(math.floor((float(parameters["y"]) - graph.y_lattice[0]) / graph.grid_size))
+
+        if not (0 <= column <= columns and 0 <= row <= rows):
+            raise ValueError("The coordinates are outside of the map.")
+
+        row, column = min(row, rows - 1), min(column, columns - 1)
+
+        return {"block": [float(graph.x_lattice[column]), float(graph.y_lattice[row]),
+                          float(graph.x_lattice[column + 1]), float(graph.y_lattice[row + 1])],
+                "crime_count": int(graph.block_counts[row, column]), "blocked": bool(graph.blocked_matrix[row, column])}
+
+    async def __post_route(self, parameters: dict) -> dict:
+        return await self.__route(parameters, parameters["start"], parameters["end"])
+
+    async def __post_routes(self, parameters: dict) -> dict:
+        routes = [self.__route(parameters, route[:2], route[2:4]) for route in parameters["routes"]]
+        return {"routes": await asyncio.gather(*routes)}
+
+    async def __get_stats(self, parameters: dict) -> dict:
+        requests = {}
+
+        for path, latencies in self.__latencies.items():
+            ordered = sorted(latencies)
+            requests[path] = {"count": self.__request_counts[path], "errors": self.__error_counts.get(path, 0),
+                              "p50": percentile(ordered, 50), "p90": percentile(ordered, 90),
+                              "p99": percentile(ordered, 99), "max": ordered[-1]}
+
+        return {"uptime": time.time() - self.__start_time, "requests": requests, "grids": self.__batch_stats}
+
+    # Searches a route of the request, the parameters are the ones of the request
+    async def __route(self, parameters: dict, start: list, end: list) -> dict:
+        if not (is_point(start) and is_point(end)):
+            raise ValueError("The start and end must be [x, y] pairs of numbers.")
+
+        graph = self.__grids[parameters["grid"]]
+        heuristic = parameters.get("heuristic", "octile")
+        weight = float(parameters.get("weight", 1.0))
+        return_path = bool(parameters.get("path", False))
+
+        # Only the names of the registry can be sent to the worker processes, this also checks the weight
+        if not isinstance(heuristic, str):
+            raise ValueError("The heuristic must be the name of one of the registry.")
+
+        make_heuristic(heuristic, graph.move_table, 0, weight)
+
+        start_coords = check_coordinates_validity(start, graph, parameters.get("mode", "auto"))
+        end_coords = check_coordinates_validity(end, graph, parameters.get("mode", "auto"))
+        start_point = graph.to_lattice(start_coords)
+        end_point = graph.to_lattice(end_coords)
+        result = {"start": start_coords, "end": end_coords, "cost": None, "path_length": 0, "nodes_expanded": 0,
+                  "timed_out": False}
+
+        # There's no need to search when one of the points is invalid
+        if graph.is_invalid_point(start_point) or graph.is_invalid_point(end_point):
+            return dict(result, path=[]) if return_path else result
+
+        move_table = graph.move_table
+        cost, path, path_length, nodes_expanded, timed_out = await self.__queue_route(
+            (parameters["grid"], heuristic, weight), move_table.point_id(start_point), move_table.point_id(end_point),
+            return_path)
+
+        result.update(cost=cost, path_length=path_length, nodes_expanded=nodes_expanded, timed_out=timed_out)
+
+        if return_path:
+            result["path"] = [graph.to_coordinates(move_table.point(point_id)) for point_id in path]
+
+        return result
+
+    # Adds the route to the batch of its map, heuristic and weight, the batch is sent when it's full or after the
+    # batch delay. Returns the future of the result of the search.
+    def __queue_route(self, key: tuple, start_id: int, end_id: int, return_path: bool) -> asyncio.Future:
+        future = self.__loop.create_future()
+        pending = self.__pending.setdefault(key, [])
+        pending.append((start_id, end_id, return_path, future))
+
+        if len(pending) >= self.__batch_size:
+            self.__flush(key)
+        elif len(pending) == 1:
+            self.__flush_handles[key] = self.__loop.call_later(self.__batch_delay, self.__flush, key)
+
+        return future
+
+    # Sends the routes waiting in the batch to the pool
+    def __flush(self, key: tuple) -> None:
+        handle = self.__flush_handles.pop(key, None)
+
+        if handle is not None:
+            handle.cancel()
+
+        routes = self.__pending.pop(key, [])
+
+        if routes:
+            # The tasks are kept until they're done, the event loop only keeps weak references to them
+            task = self.__loop.create_task(self.__search_batch(key, routes))
+            self.__batch_tasks.add(task)
+            task.add_done_callback(self.__batch_tasks.discard)
+
+    async def __search_batch(self, key: tuple, routes: list) -> None:
+        name, heuristic, weight = key
+        batch_stats = self.__batch_stats[name]
+
+        try:
+            async with self.__semaphores[name]:
+                batch_stats["in_flight"] += 1
+
+                try:
+                    results = await self.__loop.run_in_executor(
+                        self.__executor, _search_routes,
+                        (name, [route[:3] for route in routes], self.__time_limit, heuristic, weight))
+                finally:
+                    batch_stats["in_flight"] -= 1
+        except Exception as error:
+            for route in routes:
+                if not route[3].done():
+                    route[3].set_exception(error)
+            return
+
+        batch_stats["batches"] += 1
+        batch_stats["routes"] += len(routes)
+
+        for route, result in zip(routes, results):
+            if not route[3].done():
+                route[3].set_result(result)
+
+
+# The value at the percent of the sorted values, the nearest one by rank. None when there are no values.
+def percentile(ordered: list, percent: float):
+    if not ordered:
+        return None
+
+    return ordered[max(int(math.ceil(percent / 100 * len(ordered))) - 1, 0)]
+
+
+# Tells if the value is a point of a request, a list of 2 finite numbers
+def is_point(value) -> bool:
+    return isinstance(value, list) and len(value) == 2 and all(
+        isinstance(number, (int, float)) and not isinstance(number, bool) and math.isfinite(number) for number in value)
+
+
+# Loads the shapefile and builds its map with everything the searches need, ready for a RouteServer
+def load_grid(shapefile: str, grid_size: float, threshold: float, cache=None) -> LocationGrid:
+    graph = LocationGrid(shapefile, grid_size, threshold, cache)
+    graph.set_coordinates_validity()
+    return graph
+
+
+# Runs in every worker process when it starts, the move tables are built on the shared memory of the server
+def _attach_move_tables(tables: dict) -> None:
+    global _worker_move_tables, _worker_memory
+
+    _worker_move_tables = {}
+    _worker_memory = []
+
+    for name, description in tables.items():
+        # The memory blocks are kept so they stay mapped as long as the worker lives
+        _worker_move_tables[name], memory = attach_move_table(description)
+        _worker_memory += memory
+
+
+# Runs in the worker processes, searches a batch of routes of a map. Returns the cost, the ids of the points of the
+# path, only when they were asked for, the length of the path, the number of expanded points of every route and
+# whether its search was stopped by the time limit, its cost being None like for the routes without a path.
+def _search_routes(task: tuple) -> list:
+    name, routes, time_limit, heuristic, weight = task
+    move_table = _worker_move_tables[name]
+    results = []
+
+    for start_id, end_id, return_path in routes:
+        timed_out = False
+
+        try:
+            path, cost, nodes_expanded = a_star(move_table, start_id, end_id,
+                                                make_heuristic(heuristic, move_table, end_id, weight), time_limit)
+        except TimeoutError:
+            path, cost, nodes_expanded = [], None, 0
+            timed_out = True
+
+        results.append((cost, path if return_path else None, len(path), nodes_expanded, timed_out))
+
+    return results
@@ -0,0 +1,89 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import heapq
+import time
+
+
+# This gathers what a search did, it's given to a search that fills it in as it goes.
+# The times are in seconds. The moves come from the move table with their costs, so the time of the cost lookups is
+# part of neighbours_time. When record_exploration is set, explored gets the ids of the expanded points in the order
+# they were expanded, and on_expand, when given, is called with the id of every expanded point as it happens.
+class SearchStats:
+    def __init__(self, record_exploration: bool = False, on_expand=None):
+        self.record_exploration = record_exploration
+        self.on_expand = on_expand
+        self.nodes_expanded = 0
+        self.nodes_generated = 0  # Every push in an open list
+        self.duplicate_pushes = 0  # The pushes of points that were already in an open list with a higher cost
+        self.max_open_size = 0
+        self.neighbours_time = 0.0
+        self.heuristic_time = 0.0
+        self.heap_time = 0.0
+        self.total_time = 0.0
+        self.path_cost = None
+        self.path_length = 0
+        self.explored = []
+
+    def __repr__(self) -> str:
+        return "SearchStats(%s)" % ", ".join("%s=%r" % item for item in self.as_dict().items())
+
+    # The stats as a dictionary, without the explored points
+    def as_dict(self) -> dict:
+        return {"nodes_expanded": self.nodes_expanded, "nodes_generated": self.nodes_generated,
+                "duplicate_pushes": self.duplicate_pushes, "max_open_size": self.max_open_size,
+                "neighbours_time": self.neighbours_time, "heuristic_time": self.heuristic_time,
+                "heap_time": self.heap_time, "total_time": self.total_time, "path_cost": self.path_cost,
+                "path_length": self.path_length}
+
+    # Called by the searches every time they expand a point
+    def expanded(self, point_id: int) -> None:
+        if self.record_exploration:
+            self.explored.append(point_id)
+
+        if self.on_expand is not None:
+            self.on_expand(point_id)
+
+    # Called by the searches when they're done
+    def finished(self, path: list, cost, nodes_expanded: int, start_time: float) -> None:
+        self.nodes_expanded += nodes_expanded
+        self.path_cost = cost
+        self.path_length = len(path)
+        self.total_time += time.perf_counter() - start_time
+
+    # Returns the neighbours function of a move table, timed
+    def timed_neighbours(self, neighbours):
+        def timed(point_id: int) -> list:
+            start_time = time.perf_counter()
+            point_neighbours = neighbours(point_id)
+            self.neighbours_time += time.perf_counter() - start_time
+            return point_neighbours
+
+        return timed
+
+    # Returns the heuristic, timed
+    def timed_heuristic(self, heuristic):
+        def timed(point_id: int) -> float:
+            start_time = time.perf_counter()
+            estimate = heuristic(point_id)
+            self.heuristic_time += time.perf_counter() - start_time
+            return estimate
+
+        return timed
+
+    # heapq.heappush(), timed and counted
+    def push(self, heap: list, item) -> None:
+        start_time = time.perf_counter()
+        heapq.heappush(heap, item)
+        self.heap_time += time.perf_counter() - start_time
+        self.nodes_generated += 1
+        self.max_open_size = max(self.max_open_size, len(heap))
+
+    # heapq.heappop(), timed
+    def pop(self, heap: list):
+        start_time = time.perf_counter()
+        item = heapq.heappop(heap)
+        self.heap_time += time.perf_counter() - start_time
+        return item
@@ -0,0 +1,82 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import os
+
+import numpy as np
+import shapefile as shp
+
+# A point shapefile is a 100 bytes header followed by fixed size records: a big endian record number and content
+# length, then a little endian shape type and the x and y coordinates. The length is counted in 16 bits words.
+HEADER_SIZE = 100
+POINT_SHAPE_TYPE = 1
+POINT_RECORD = np.dtype([("number", ">i4"), ("length", ">i4"), ("shape_type", "<i4"), ("x", "<f8"), ("y", "<f8")])
+POINT_CONTENT_LENGTH = (POINT_RECORD.itemsize - 8) // 2
+
+
+# Reads the coordinates of all the points of a shapefile, the path can be given with or without the .shp extension.
+# Returns a float64 array of shape (N, 2) with a row (x, y) per point, and the bounding box [x1, y1, x2, y2].
+def read_points(shapefile: str) -> tuple:
+    path = shapefile if shapefile.lower().endswith(".shp") else shapefile + ".shp"
+
+    header = np.fromfile(path, dtype=np.uint8, count=HEADER_SIZE)
+    shape_type = int(header[32:36].view("<i4")[0])
+    bbox = header[36:68].view("<f8").tolist()
+
+    record_bytes = os.path.getsize(path) - HEADER_SIZE
+
+    # All the records of a point shapefile have the same layout, unless some of them are null shapes.
+    # In that case the points are read record by record instead.
+    if shape_type == POINT_SHAPE_TYPE and record_bytes % POINT_RECORD.itemsize == 0:
+        records = np.memmap(path, dtype=POINT_RECORD, mode="r", offset=HEADER_SIZE,
+                            shape=(record_bytes // POINT_RECORD.itemsize,))
+
+        if np.all(records["shape_type"] == POINT_SHAPE_TYPE) and np.all(records["length"] == POINT_CONTENT_LENGTH):
+            # The coordinates are copied out of the memory mapped file in a single pass
+            points = np.empty((len(records), 2), dtype=np.float64)
+            points[:, 0] = records["x"]
+            points[:, 1] = records["y"]
+            return points, bbox
+
+    with shp.Reader(shapefile) as sf:
+        points = [shape.points[0] for shape in sf.iterShapes() if shape.points]
+        return np.array(points, dtype=np.float64).reshape(-1, 2), bbox
+
+
+# Writes the points, a float64 array of shape (N, 2) with a row (x, y) per point, as a point shapefile with its .shp
+# and .shx files. The path can be given with or without the .shp extension. There's no .dbf, the points have no
+# other information.
+def write_points(shapefile: str, points: np.ndarray) -> None:
+    path = shapefile[:-4] if shapefile.lower().endswith(".shp") else shapefile
+    count = len(points)
+
+    records = np.zeros(count, dtype=POINT_RECORD)
+    records["number"] = np.arange(1, count + 1)
+    records["length"] = POINT_CONTENT_LENGTH
+    records["shape_type"] = POINT_SHAPE_TYPE
+    records["x"] = points[:, 0]
+    records["y"] = points[:, 1]
+
+    # The index has the offset and the content length of every record, both counted in 16 bits words
+    index = np.zeros(count, dtype=[("offset", ">i4"), ("length", ">i4")])
+    index["offset"] = (HEADER_SIZE + np.arange(count) * POINT_RECORD.itemsize) // 2
+    index["length"] = POINT_CONTENT_LENGTH
+
+    bbox = [points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()] if count else [0] * 4
+
+    for extension, content in ((".shp", records), (".shx", index)):
+        with open(path + extension, "wb") as shp_file:
+            shp_file.write(_header(HEADER_SIZE + content.nbytes, bbox))
+            content.tofile(shp_file)
+
+
+# The 100 bytes header of the .shp and .shx files of a point shapefile, the file length is in bytes
+def _header(file_length: int, bbox: list) -> bytes:
+    header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+    header[0:4] = np.array([9994], dtype=">i4").view(np.uint8)  # The file code
+    header[24:28] = np.array([file_length // 2], dtype=">i4").view(np.uint8)
+    header[28:36] = np.array([1000, POINT_SHAPE_TYPE], dtype="<i4").view(np.uint8)  # The version and shape type
+    header[36:68] = np.array(bbox, dtype="<f8").view(np.uint8)
+    return header.tobytes()
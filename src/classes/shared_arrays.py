@@ -0,0 +1,42 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from classes.move_table import MoveTable
+
+
+# Copies the array into a new block of shared memory. The block has to be closed and unlinked once the processes
+# reading it are done.
+def share_array(array: np.ndarray) -> shared_memory.SharedMemory:
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+    return memory
+
+
+# Maps the block of shared memory with the given name as an array of the shape and dtype it was shared with.
+# Returns the array and the block, which has to be kept as long as the array is used.
+def attach_array(name: str, shape: tuple, dtype: str) -> tuple:
+    memory = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=memory.buf), memory
+
+
+# Copies the masks and costs of the move table into shared memory. Returns the blocks, to close and unlink once the
+# processes reading them are done, and the description of the table attach_move_table() builds it again from.
+def share_move_table(move_table: MoveTable) -> tuple:
+    memory = [share_array(move_table.masks), share_array(move_table.costs)]
+    description = tuple((block.name, array.shape, array.dtype.str)
+                        for block, array in zip(memory, (move_table.masks, move_table.costs)))
+    return memory, description
+
+
+# Builds the move table shared by share_move_table() on its shared memory, without copying it. The table reads the
+# moves of a point from the shared arrays when the point is expanded, so not even its neighbour lists are copied.
+# Returns the table and the blocks, which have to be kept as long as the table is used.
+def attach_move_table(description: tuple) -> tuple:
+    (masks, masks_memory), (costs, costs_memory) = (attach_array(*array) for array in description)
+    return MoveTable(masks, costs, lazy=True), [masks_memory, costs_memory]
@@ -3,14 +3,42 @@
 # Written by Mahdi Chaari - 27219946
 # For COMP 472 Section ABKX – Summer 2020
 # --------------------------------------------------------
-import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+import sys
 import time
 
+from classes.batch_search import read_route_pairs
+from classes.hierarchical_search import hierarchical_search
+from classes.jump_point_search import jump_search
 from classes.location_grid import LocationGrid
-from classes.node import informed_search
+from classes.node import bidirectional_search, informed_search
+
+# The searches the command line can run, they all take the map, the start and end coordinates and the arguments
+SEARCHES = {
+    "astar": lambda graph, start, end, arguments: informed_search(graph, start, end, heuristic=arguments.heuristic,
+                                                                   weight=arguments.weight),
+    "jump": lambda graph, start, end, arguments: jump_search(graph, start, end, heuristic=arguments.heuristic,
+                                                             weight=arguments.weight),
+    "bidirectional": lambda graph, start, end, arguments: bidirectional_search(graph, start, end,
+                                                                               heuristic=arguments.heuristic),
+    "hierarchical": lambda graph, start, end, arguments: hierarchical_search(graph, start, end),
+}
+
+
+# Without arguments, the program asks for everything as it goes and shows the graphs in windows.
+# With arguments, it runs once from them without any prompt or window, see --help.
+def main():
+    if len(sys.argv) > 1:
+        run_headless(parse_arguments(sys.argv[1:]))
+    else:
+        run_interactive()
 
 
-def main():
+def run_interactive():
+    import matplotlib.pyplot as plt
+
     print("Hello and welcome.\nI will be fast and concise.\nWe both know what we're here for."
           "\nThere is no validation for user input.\nI'm trusting you know what you're doing.\nFollow instructions.")
 
@@ -111,5 +139,103 @@ def main():
     print("\nThank you for using this program.\nIt's time to terminate.")
 
 
+# The arguments can also be given in a JSON config file, as an object with the same names as the arguments, eg:
+# {"grid_size": 0.002, "threshold": 0.5, "route": [[-73.58, 45.49, -73.55, 45.52]], "figures": "./figures"}
+# The arguments given on the command line take precedence over the ones of the file, the routes given with --route
+# replace all the routes of the file.
+def parse_arguments(args: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Builds the grid of the crimes and searches the shortest paths "
+                                                 "between the given points, without prompts or windows.")
+    parser.add_argument("--config", help="a JSON file with the arguments")
+    parser.add_argument("--shapefile", default="./../resources/crime_dt", help="default: %(default)s")
+    parser.add_argument("--grid-size", type=float, default=0.002, help="default: %(default)s")
+    parser.add_argument("--threshold", type=float, default=0.5, help="between 0 and 1, default: %(default)s")
+    parser.add_argument("--route", nargs=4, type=float, action="append",
+                        metavar=("START_X", "START_Y", "END_X", "END_Y"),
+                        help="a route to search, can be repeated, replaces the routes of the config file")
+    parser.add_argument("--routes", help="a CSV file with a start_x, start_y, end_x, end_y row per route")
+    parser.add_argument("--search", choices=sorted(SEARCHES), default="astar", help="default: %(default)s")
+    parser.add_argument("--heuristic", default="octile", help="default: %(default)s")
+    parser.add_argument("--weight", type=float, default=1.0, help="default: %(default)s")
+    parser.add_argument("--figures", help="the directory the scatter, block and path graphs are saved to as PNG")
+
+    arguments = parser.parse_args(args)
+    config_routes = []
+
+    if arguments.config is not None:
+        with open(arguments.config) as config_file:
+            config = json.load(config_file)
+
+        # The values of the file are parsed like the ones of the command line, so they're converted to the types of
+        # the arguments and the wrong ones are reported the same way
+        config_arguments, unknown = parser.parse_known_args(config_args(config))
+
+        if unknown:
+            parser.error("unknown arguments in %s: %s" % (arguments.config, " ".join(unknown)))
+
+        # The routes of the file aren't a default, the ones given with --route would be appended to them
+        config_routes = config_arguments.route or []
+        config_arguments.route = None
+        parser.set_defaults(**vars(config_arguments))
+        arguments = parser.parse_args(args)
+
+    if arguments.route is None:
+        arguments.route = config_routes
+
+    return arguments
+
+
+# The command line arguments giving the values of the config file, whose keys are the names of the arguments with
+# underscores or dashes. The value of "route" is a list of routes of 4 values, the other values are single ones.
+def config_args(config: dict) -> list:
+    args = []
+
+    for key, value in config.items():
+        option = "--" + key.replace("_", "-")
+
+        if key == "route" and isinstance(value, list):
+            for route in value:
+                args += [option] + [str(item) for item in (route if isinstance(route, list) else [route])]
+        else:
+            args += [option, str(value)]
+
+    return args
+
+
+# Runs the binning, the validity and the searches of the arguments, then saves the graphs when asked
+def run_headless(arguments: argparse.Namespace) -> None:
+    loading_time = time.time()
+
+    lg = LocationGrid(arguments.shapefile, arguments.grid_size, arguments.threshold)
+    lg.headless_graph()
+    lg.set_coordinates_validity()
+
+    print("Time to read and generate data: %.3f seconds" % (time.time() - loading_time))
+    print("Average crime count per grid square: " + str(lg.crime_mean))
+    print("Crime count standard deviation: " + str(lg.crime_standard_deviation))
+
+    if arguments.figures is not None:
+        os.makedirs(arguments.figures, exist_ok=True)
+        lg.show_scatter(os.path.join(arguments.figures, "scatter.png"))
+        lg.show_block(os.path.join(arguments.figures, "block.png"))
+
+    routes = [((start_x, start_y), (end_x, end_y)) for start_x, start_y, end_x, end_y in arguments.route]
+
+    if arguments.routes is not None:
+        routes.extend(read_route_pairs(arguments.routes))
+
+    for index, (start_coords, end_coords) in enumerate(routes):
+        loading_time = time.time()
+
+        path = SEARCHES[arguments.search](lg, start_coords, end_coords, arguments)
+
+        print("\nTime to find shortest path: %.3f seconds" % (time.time() - loading_time))
+
+        if path and arguments.figures is not None:
+            lg.update_path_data(path)
+            lg.show_block(os.path.join(arguments.figures, "path_%d.png" % index))
+            lg.update_path_data([])
+
+
 if __name__ == "__main__":
     main()
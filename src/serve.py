@@ -0,0 +1,73 @@
+# -------------------------------------------------------
+# Assignment 1
+# Written by Mahdi Chaari - 27219946
+# For COMP 472 Section ABKX – Summer 2020
+# --------------------------------------------------------
+import argparse
+import asyncio
+import signal
+import time
+
+from classes.grid_cache import GridCache
+from classes.route_server import RouteServer, load_grid
+
+
+# Loads the maps once, then answers route requests over HTTP until it's stopped, see RouteServer for the endpoints
+def main():
+    arguments = parse_arguments()
+    cache = GridCache(arguments.cache) if arguments.cache is not None else None
+    grids = {}
+
+    default_grids = [("crime_dt", "./../resources/crime_dt", 0.002, 0.5)]
+
+    for name, shapefile, grid_size, threshold in arguments.grid or default_grids:
+        loading_time = time.time()
+        grids[name] = load_grid(shapefile, float(grid_size), float(threshold), cache)
+        print("Loaded %s in %.3f seconds" % (name, time.time() - loading_time))
+
+    server = RouteServer(grids, arguments.processes, arguments.max_concurrency, arguments.batch_size,
+                         arguments.batch_delay, arguments.time_limit)
+
+    try:
+        asyncio.run(serve(server, arguments))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+async def serve(server: RouteServer, arguments: argparse.Namespace) -> None:
+    listening = await server.start(arguments.host, arguments.port, arguments.unix)
+    print("Listening on " + (arguments.unix or "http://%s:%d" % (arguments.host, arguments.port)))
+
+    # The server stops the same way on a SIGTERM as on a Ctrl+C, so the shared memory of the maps is freed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, listening.close)
+
+    async with listening:
+        try:
+            await listening.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Loads the maps once and answers route and block requests for them "
+                                                 "over HTTP.")
+    parser.add_argument("--grid", nargs=4, action="append", metavar=("NAME", "SHAPEFILE", "GRID_SIZE", "THRESHOLD"),
+                        help="a map to serve, can be repeated (default: crime_dt ./../resources/crime_dt 0.002 0.5)")
+    parser.add_argument("--host", default="127.0.0.1", help="default: %(default)s")
+    parser.add_argument("--port", type=int, default=8080, help="default: %(default)s")
+    parser.add_argument("--unix", help="the path of a Unix socket to listen on instead of the host and port")
+    parser.add_argument("--processes", type=int, help="the number of search processes (default: one per CPU)")
+    parser.add_argument("--max-concurrency", type=int, default=2,
+                        help="the most batches of a map searched at once (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=32, help="default: %(default)s")
+    parser.add_argument("--batch-delay", type=float, default=0.002,
+                        help="the most seconds a route waits for others to be searched with (default: %(default)s)")
+    parser.add_argument("--time-limit", type=float, default=10, help="default: %(default)s")
+    parser.add_argument("--cache", help="a directory the maps are kept in between runs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()